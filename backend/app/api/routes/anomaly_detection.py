@@ -2,13 +2,18 @@
 """
 Anomaly Detection API Routes
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
 from datetime import datetime, timedelta
+from typing import Optional
 from app.config import get_settings, Settings
 from app.services.azure_auth import AzureAuthService
-from app.services.cost_data import CostDataService
 from app.services.cost_processor import CostProcessorService
 from app.services.anomaly_detector import AnomalyDetectorService
+from app.services.anomaly_alerts import AnomalyAlertService
+from app.services.query_planner import QueryPlannerService
+from app.services.admission import AdmissionRejectedError, estimate_request_cost, get_admission_controller
+from app.utils.concurrency import run_blocking
+from app.utils.data_source import create_cost_data_service, get_deadline
 from app.models.requests import AnomalyDetectionRequest
 
 router_anomaly = APIRouter()
@@ -17,25 +22,48 @@ router_anomaly = APIRouter()
 @router_anomaly.post("/detect")
 async def detect_anomalies(
     request: AnomalyDetectionRequest,
+    x_request_timeout: Optional[float] = Header(None, gt=0),
     settings: Settings = Depends(get_settings)
 ):
     """Detect cost anomalies across subscriptions"""
     
+    # Upstream calls must finish within the caller's own timeout
+    deadline = get_deadline(settings, x_request_timeout)
+    
+    estimate = estimate_request_cost('detect', 1, settings.admission_rows_per_slot)
+    
+    try:
+        async with get_admission_controller().admit(estimate['weight'], reserved=True):
+            return await run_blocking(_detect_anomalies, request, settings, deadline)
+    except AdmissionRejectedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': str(e.retry_after)})
+
+
+def _detect_anomalies(request: AnomalyDetectionRequest, settings: Settings, deadline: Optional[float]):
+    """Run anomaly detection, blocking on upstream calls"""
+    
+    # Parse target date
     try:
-        # Parse target date
         if request.target_date:
             target_date = datetime.strptime(request.target_date, '%Y-%m-%d')
         else:
             target_date = datetime.now() - timedelta(days=1)
-        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date format: {str(e)}")
+    
+    try:
         # Initialize services
         auth_service = AzureAuthService(settings)
-        access_token = auth_service.get_access_token()
         subscriptions = auth_service.get_subscriptions()
         
-        cost_data_service = CostDataService(access_token)
+        cost_data_service = create_cost_data_service(settings, auth_service, deadline)
+        query_planner = QueryPlannerService(cost_data_service)
         cost_processor = CostProcessorService()
-        anomaly_detector = AnomalyDetectorService(cost_data_service, cost_processor)
+        anomaly_detector = AnomalyDetectorService(query_planner, cost_processor)
+        
+        # Fetch all needed data up front
+        anomaly_detector.register_queries(query_planner, subscriptions, [target_date])
+        query_planner.execute()
         
         # Check subscriptions
         results = anomaly_detector.check_all_subscriptions(
@@ -46,34 +74,52 @@ async def detect_anomalies(
         
         return results
         
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=f"Invalid date format: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router_anomaly.get("/history")
 async def get_anomaly_history(
-    days: int = 7,
+    days: int = Query(7, ge=1, le=90, description="Number of days to look back"),
     threshold: float = 25.0,
+    x_request_timeout: Optional[float] = Header(None, gt=0),
     settings: Settings = Depends(get_settings)
 ):
     """Get anomaly detection history for multiple days"""
     
+    # Upstream calls must finish within the caller's own timeout
+    deadline = get_deadline(settings, x_request_timeout)
+    
+    estimate = estimate_request_cost('history', days, settings.admission_rows_per_slot)
+    
+    try:
+        async with get_admission_controller().admit(estimate['weight']):
+            return await run_blocking(_get_anomaly_history, days, threshold, settings, deadline)
+    except AdmissionRejectedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': str(e.retry_after)})
+
+
+def _get_anomaly_history(days: int, threshold: float, settings: Settings, deadline: Optional[float]):
+    """Run anomaly detection for each day, blocking on upstream calls"""
+    
     try:
         # Initialize services
         auth_service = AzureAuthService(settings)
-        access_token = auth_service.get_access_token()
         subscriptions = auth_service.get_subscriptions()
         
-        cost_data_service = CostDataService(access_token)
+        cost_data_service = create_cost_data_service(settings, auth_service, deadline)
+        query_planner = QueryPlannerService(cost_data_service)
         cost_processor = CostProcessorService()
-        anomaly_detector = AnomalyDetectorService(cost_data_service, cost_processor)
+        anomaly_detector = AnomalyDetectorService(query_planner, cost_processor)
+        
+        # Overlapping day windows are merged into one query per subscription
+        target_dates = [datetime.now() - timedelta(days=i) for i in range(days, 0, -1)]
+        anomaly_detector.register_queries(query_planner, subscriptions, target_dates)
+        query_planner.execute()
         
         # Check each day
         history = []
-        for i in range(days, 0, -1):
-            target_date = datetime.now() - timedelta(days=i)
+        for target_date in target_dates:
             result = anomaly_detector.check_all_subscriptions(
                 subscriptions,
                 target_date,
@@ -84,4 +130,39 @@ async def get_anomaly_history(
         return {"history": history}
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def evaluate_alerts(settings: Settings, threshold_percent: float) -> dict:
+    """Evaluate newly landed cost data and push changed anomaly results"""
+    
+    auth_service = AzureAuthService(settings)
+    subscriptions = auth_service.get_subscriptions()
+    
+    cost_data_service = create_cost_data_service(settings, auth_service)
+    alert_service = AnomalyAlertService(
+        QueryPlannerService(cost_data_service),
+        CostProcessorService(),
+        settings.alert_state_path,
+        settings.alert_webhook_urls,
+        settings.alert_restatement_days
+    )
+    
+    return alert_service.evaluate(subscriptions, threshold_percent)
+
+
+@router_anomaly.post("/alerts/evaluate")
+def evaluate_anomaly_alerts(
+    threshold: Optional[float] = None,
+    settings: Settings = Depends(get_settings)
+):
+    """Evaluate new or restated days and push anomaly changes to the configured webhooks"""
+    
+    try:
+        if threshold is None:
+            threshold = settings.alert_threshold_percent
+        
+        return evaluate_alerts(settings, threshold)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,132 @@
+# api/routes/cost_queries.py
+"""
+Cost Range Query API Routes
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Optional
+from app.config import get_settings, Settings
+from app.services.azure_auth import AzureAuthService
+from app.services.backfill import BackfillService
+from app.services.cost_index import get_cost_index, CostIndexService
+from app.utils.data_source import create_cost_data_service
+from app.utils.concurrency import run_blocking
+
+router_costs = APIRouter()
+
+
+def ensure_index_fresh(settings: Settings, subscription: str) -> CostIndexService:
+    """Load newly arrived days into the index once the refresh interval has passed"""
+    
+    cost_index = get_cost_index()
+    
+    auth_service = AzureAuthService(settings)
+    subscriptions = auth_service.get_subscriptions()
+    
+    if subscription not in subscriptions:
+        raise ValueError(f"Unknown subscription: {subscription}")
+    
+    since_refresh = cost_index.seconds_since_refresh(subscription)
+    if since_refresh is None or since_refresh > settings.cost_index_refresh_seconds:
+        cost_data_service = create_cost_data_service(settings, auth_service)
+        cost_index.refresh_if_stale(
+            subscription,
+            settings.cost_index_refresh_seconds,
+            cost_data_service,
+            {subscription: subscriptions[subscription]},
+            settings.cost_index_initial_days,
+            settings.cost_index_restatement_days,
+            backfill_service=BackfillService(cost_data_service, settings.backfill_directory)
+        )
+    
+    return cost_index
+
+
+@router_costs.get("/range")
+async def get_range_cost(
+    subscription: str,
+    start_date: str,
+    end_date: Optional[str] = None,
+    category: str = "Total",
+    settings: Settings = Depends(get_settings)
+):
+    """Get the total cost of a category between two dates, inclusive"""
+    
+    try:
+        cost_index = await run_blocking(ensure_index_fresh, settings, subscription)
+        
+        last_day = cost_index.last_day(subscription)
+        if last_day is None:
+            raise ValueError(f"No cost data indexed for subscription: {subscription}")
+        
+        # Days that have not landed yet are left out, the response shows the covered range
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else last_day
+        end = min(end, last_day)
+        
+        total = cost_index.range_total(subscription, category, start, end)
+        
+        return {
+            'subscription': subscription,
+            'category': category,
+            'start_date': start.strftime('%Y-%m-%d'),
+            'end_date': end.strftime('%Y-%m-%d'),
+            'total_cost': round(total, 2)
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router_costs.get("/rollups")
+async def get_cost_rollups(
+    subscription: str,
+    period: str = "month",
+    category: str = "Total",
+    settings: Settings = Depends(get_settings)
+):
+    """Get weekly or monthly cost totals"""
+    
+    try:
+        cost_index = await run_blocking(ensure_index_fresh, settings, subscription)
+        
+        totals = cost_index.rollups(subscription, category, period)
+        first_day = cost_index.first_day(subscription)
+        last_day = cost_index.last_day(subscription)
+        
+        # The first and last periods may only be partly covered by the index
+        return {
+            'subscription': subscription,
+            'category': category,
+            'period': period,
+            'start_date': first_day.strftime('%Y-%m-%d') if first_day else None,
+            'end_date': last_day.strftime('%Y-%m-%d') if last_day else None,
+            'totals': {key: round(value, 2) for key, value in totals.items()}
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router_costs.get("/budget")
+async def get_budget_status(
+    subscription: str,
+    budget: float,
+    category: str = "Total",
+    settings: Settings = Depends(get_settings)
+):
+    """Compare month-to-date cost against a monthly budget"""
+    
+    try:
+        cost_index = await run_blocking(ensure_index_fresh, settings, subscription)
+        
+        return cost_index.budget_status(subscription, category, budget)
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -2,59 +2,105 @@
 """
 Cost Report API Routes
 """
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import FileResponse, Response
 from app.config import get_settings, Settings
 from app.services.azure_auth import AzureAuthService
-from app.services.cost_data import CostDataService
 from app.services.cost_processor import CostProcessorService
 from app.services.document_generator import DocumentGeneratorService
+from app.services.query_planner import QueryPlannerService
+from app.services.report_store import get_report_store
+from app.services.admission import AdmissionRejectedError, estimate_request_cost, get_admission_controller
+from app.utils.concurrency import run_blocking
+from app.utils.data_source import create_cost_data_service, get_deadline
 from app.models.requests import CostReportRequest
 from app.models.responses import CostReportResponse
+from typing import Optional
 import os
-import time
 
 router = APIRouter()
 
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
 
 @router.post("/generate", response_model=CostReportResponse)
 async def generate_cost_report(
     request: CostReportRequest,
+    stream: bool = False,
+    x_request_timeout: Optional[float] = Header(None, gt=0),
     settings: Settings = Depends(get_settings)
 ):
-    """Generate a cost report Word document"""
+    """Generate a cost report Word document
+    
+    With ``stream=true`` the document is returned directly in the response.
+    """
+    
+    # Upstream calls must finish within the caller's own timeout
+    deadline = get_deadline(settings, x_request_timeout)
+    
+    estimate = estimate_request_cost('generate', request.num_days, settings.admission_rows_per_slot)
+    
+    try:
+        async with get_admission_controller().admit(estimate['weight']):
+            return await run_blocking(_generate_cost_report, request, stream, settings, deadline)
+    except AdmissionRejectedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': str(e.retry_after)})
+
+
+def _generate_cost_report(
+    request: CostReportRequest,
+    stream: bool,
+    settings: Settings,
+    deadline: Optional[float]
+):
+    """Collect report data and render the document, blocking on upstream calls"""
     
     try:
         # Initialize services
         auth_service = AzureAuthService(settings)
-        access_token = auth_service.get_access_token()
         subscriptions = auth_service.get_subscriptions()
         
-        cost_data_service = CostDataService(access_token)
+        cost_data_service = create_cost_data_service(settings, auth_service, deadline)
+        query_planner = QueryPlannerService(cost_data_service)
         cost_processor = CostProcessorService()
-        doc_generator = DocumentGeneratorService(settings.output_directory)
+        doc_generator = DocumentGeneratorService(
+            settings.output_directory,
+            settings.report_retention_count
+        )
+        
+        # Fetch all needed data up front, with a delay between API queries to avoid rate limiting
+        doc_generator.register_queries(query_planner, subscriptions, request.num_days)
+        query_planner.execute(delay_seconds=2 if settings.cost_data_source == 'api' else 0)
         
         # Collect data for all subscriptions
         all_data = {}
         
-        for idx, sub_name in enumerate(['main', 'prod', 'dev', 'test']):
+        for sub_name in ['main', 'prod', 'dev', 'test']:
             data = doc_generator.prepare_report_data(
                 subscriptions[sub_name],
                 sub_name,
                 request.num_days,
-                cost_data_service,
+                query_planner,
                 cost_processor
             )
             
             if data:
                 all_data[sub_name] = data
-            
-            # Add delay between subscriptions to avoid rate limiting
-            if idx < 3:
-                time.sleep(2)
         
-        # Generate document
-        filename = doc_generator.generate_cost_report(all_data, request.num_days)
+        # Generate document in memory
+        filename, content = doc_generator.render_cost_report(all_data, request.num_days)
+        
+        if stream:
+            return Response(
+                content,
+                media_type=DOCX_MEDIA_TYPE,
+                headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+            )
+        
+        if settings.report_storage == 'memory':
+            get_report_store().put(filename, content)
+        else:
+            doc_generator.save_report(filename, content)
         
         return CostReportResponse(
             status="success",
@@ -71,6 +117,15 @@ async def generate_cost_report(
 async def download_report(filename: str, settings: Settings = Depends(get_settings)):
     """Download a generated report"""
     
+    # Reports held in memory can only be downloaded once
+    content = get_report_store().pop(filename)
+    if content is not None:
+        return Response(
+            content,
+            media_type=DOCX_MEDIA_TYPE,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+    
     filepath = os.path.join(settings.output_directory, filename)
     
     if not os.path.exists(filepath):
@@ -78,7 +133,7 @@ async def download_report(filename: str, settings: Settings = Depends(get_settin
     
     return FileResponse(
         filepath,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        media_type=DOCX_MEDIA_TYPE,
         filename=filename
     )
 
@@ -0,0 +1,30 @@
+# api/routes/profiling.py
+"""
+Profiling API Routes
+"""
+from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import FileResponse
+from app.config import get_settings, Settings
+import hmac
+import os
+
+router_profiling = APIRouter()
+
+
+@router_profiling.get("/{filename}")
+async def download_profile(
+    filename: str,
+    x_admin_token: str = Header(""),
+    settings: Settings = Depends(get_settings)
+):
+    """Download a profiling artifact"""
+    
+    if not hmac.compare_digest(x_admin_token, settings.profiling_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    
+    filepath = os.path.join(settings.profile_directory, os.path.basename(filename))
+    
+    if not os.path.exists(filepath):
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return FileResponse(filepath, media_type="application/octet-stream", filename=filename)
@@ -0,0 +1,75 @@
+"""
+Historical Cost Backfill Command
+
+Usage: python -m app.backfill [--months N] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+import argparse
+from datetime import datetime, timedelta
+from app.config import get_settings
+from app.services.azure_auth import AzureAuthService
+from app.services.cost_data import CostDataService
+from app.services.backfill import BackfillService, MAX_BACKFILL_MONTHS, subtract_months
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill historical Azure cost data")
+    parser.add_argument('--months', type=int, default=MAX_BACKFILL_MONTHS, help="Months to look back")
+    parser.add_argument('--start', help="Start date in YYYY-MM-DD format (overrides --months)")
+    parser.add_argument('--end', help="End date in YYYY-MM-DD format (defaults to yesterday)")
+    parser.add_argument('--subscriptions', nargs='*', help="Subscriptions to backfill (defaults to all)")
+    args = parser.parse_args()
+    
+    settings = get_settings()
+    
+    try:
+        if args.end:
+            end_date = datetime.strptime(args.end, '%Y-%m-%d')
+        else:
+            end_date = datetime.now() - timedelta(days=1)
+        
+        if args.start:
+            start_date = datetime.strptime(args.start, '%Y-%m-%d')
+        else:
+            start_date = subtract_months(end_date, args.months) + timedelta(days=1)
+    except ValueError:
+        parser.error("Dates must be in YYYY-MM-DD format")
+    
+    if start_date > end_date:
+        parser.error("--start must not be after --end")
+    if start_date < subtract_months(end_date, MAX_BACKFILL_MONTHS):
+        parser.error(f"Backfill range cannot exceed {MAX_BACKFILL_MONTHS} months")
+    
+    auth_service = AzureAuthService(settings)
+    subscriptions = auth_service.get_subscriptions()
+    
+    if args.subscriptions:
+        unknown = [name for name in args.subscriptions if name not in subscriptions]
+        if unknown:
+            parser.error(
+                f"Unknown subscriptions: {', '.join(unknown)} (choose from {', '.join(subscriptions)})"
+            )
+        subscriptions = {name: subscriptions[name] for name in args.subscriptions}
+    
+    access_token = auth_service.get_access_token()
+    
+    backfill_service = BackfillService(
+        CostDataService(access_token),
+        settings.backfill_directory,
+        max_workers=settings.backfill_max_workers,
+        min_interval_seconds=settings.backfill_min_interval_seconds
+    )
+    
+    result = backfill_service.run(subscriptions, start_date, end_date)
+    
+    print(
+        f"Backfill {result['start_date']} to {result['end_date']}: "
+        f"{len(result['completed'])} chunks fetched, {result['skipped']} already done, "
+        f"{len(result['failed'])} failed"
+    )
+    
+    if result['failed']:
+        print("Run the command again to retry the failed chunks")
+
+
+if __name__ == "__main__":
+    main()
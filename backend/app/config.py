@@ -28,9 +28,61 @@ class Settings(BaseSettings):
     # CORS Configuration
     cors_origins: list = ["http://localhost:3000", "http://localhost:8000"]
     
+    # Upstream Resilience Configuration
+    upstream_timeout_seconds: float = 30
+    upstream_deadline_seconds: float = 0
+    upstream_breaker_failure_threshold: int = 5
+    upstream_breaker_reset_seconds: float = 30
+    upstream_hedge_enabled: bool = False
+    upstream_hedge_percentile: float = 95
+    upstream_hedge_min_samples: int = 20
+    upstream_fallback_cache_size: int = 256
+    
+    # Admission Control Configuration
+    admission_capacity: int = 16
+    admission_detect_reserved_capacity: int = 4
+    admission_heavy_capacity: int = 12
+    admission_heavy_weight: int = 2
+    admission_rows_per_slot: int = 1000
+    admission_max_queue: int = 20
+    admission_queue_timeout_seconds: float = 30
+    admission_retry_after_seconds: int = 10
+    
     # Output Configuration
     output_directory: str = "outputs"
     
+    # Report Storage Configuration ("disk" or "memory")
+    report_storage: str = "disk"
+    report_retention_count: int = 50
+    report_store_max_reports: int = 20
+    report_store_max_bytes: int = 50 * 1024 * 1024
+    
+    # Cost Data Source Configuration ("api" or "export")
+    cost_data_source: str = "api"
+    cost_export_directory: str = "exports"
+    
+    # Profiling Configuration (profiling is disabled while the token is empty)
+    profiling_admin_token: str = ""
+    profile_directory: str = "profiles"
+    profile_retention_count: int = 50
+    
+    # Cost Index Configuration
+    cost_index_initial_days: int = 90
+    cost_index_restatement_days: int = 3
+    cost_index_refresh_seconds: int = 3600
+    
+    # Anomaly Alert Configuration
+    alert_webhook_urls: list = []
+    alert_poll_interval_seconds: int = 0
+    alert_threshold_percent: float = 25.0
+    alert_restatement_days: int = 3
+    alert_state_path: str = "alert_state.json"
+    
+    # Backfill Configuration
+    backfill_directory: str = "backfill"
+    backfill_max_workers: int = 4
+    backfill_min_interval_seconds: float = 2.0
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,14 +1,18 @@
 """
 FastAPI Application Entry Point
 """
+import asyncio
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from datetime import datetime
 from app.config import get_settings, Settings
 from app.api.routes.cost_report import router as cost_report_router
-from app.api.routes.anomaly_detection import router_anomaly
+from app.api.routes.anomaly_detection import router_anomaly, evaluate_alerts
+from app.api.routes.cost_queries import router_costs
+from app.api.routes.profiling import router_profiling
 from app.models.responses import HealthResponse
+from app.utils.profiling import ProfilingMiddleware
 
 # Initialize FastAPI app
 def create_app() -> FastAPI:
@@ -29,6 +33,21 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # On-demand request profiling, not installed at all unless enabled
+    if settings.profiling_admin_token:
+        app.add_middleware(
+            ProfilingMiddleware,
+            admin_token=settings.profiling_admin_token,
+            profile_directory=settings.profile_directory,
+            retention_count=settings.profile_retention_count
+        )
+        
+        app.include_router(
+            router_profiling,
+            prefix="/api/profiles",
+            tags=["Profiling"]
+        )
+    
     # Include routers
     app.include_router(
         cost_report_router,
@@ -42,6 +61,28 @@ def create_app() -> FastAPI:
         tags=["Anomaly Detection"]
     )
     
+    app.include_router(
+        router_costs,
+        prefix="/api/costs",
+        tags=["Cost Queries"]
+    )
+    
+    # Background anomaly alert evaluation
+    async def run_alert_loop():
+        while True:
+            await asyncio.sleep(settings.alert_poll_interval_seconds)
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, evaluate_alerts, settings, settings.alert_threshold_percent
+                )
+            except Exception as e:
+                print(f"Anomaly alert evaluation failed: {str(e)}")
+    
+    @app.on_event("startup")
+    async def start_alert_loop():
+        if settings.alert_poll_interval_seconds > 0:
+            app.state.alert_task = asyncio.create_task(run_alert_loop())
+    
     # Health check endpoint
     @app.get("/api/health", response_model=HealthResponse)
     async def health_check(settings: Settings = Depends(get_settings)):
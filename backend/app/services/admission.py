@@ -0,0 +1,157 @@
+"""
+Request Admission Control Service
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Dict, Any
+from app.config import get_settings
+
+
+# Rough rows per subscription per day when grouping by ResourceType
+ROWS_PER_SUBSCRIPTION_DAY = 25
+SUBSCRIPTION_COUNT = 4
+
+# Slots each endpoint holds regardless of its row count
+ENDPOINT_BASE_WEIGHT = {
+    'detect': 1,
+    'history': 1,
+    # Three 2 s rate-limit pauses between its four queries, then a Word render
+    'generate': 3
+}
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request cannot be admitted"""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_request_cost(endpoint: str, days: int, rows_per_slot: int) -> Dict[str, Any]:
+    """Estimate a request's upstream rows and slot weight from its parameters"""
+    
+    if endpoint not in ENDPOINT_BASE_WEIGHT:
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+    
+    if endpoint == 'generate':
+        queried_days = days
+    else:
+        # Checked days plus the 7-day baseline, fetched once per subscription
+        queried_days = days + 7
+    
+    rows = SUBSCRIPTION_COUNT * queried_days * ROWS_PER_SUBSCRIPTION_DAY
+    
+    return {
+        'rows': rows,
+        'weight': ENDPOINT_BASE_WEIGHT[endpoint] + rows // rows_per_slot
+    }
+
+
+class AdmissionController:
+    """Run requests in weighted concurrency slots with a bounded wait queue
+    
+    Part of the capacity is reserved for requests admitted with ``reserved``,
+    so they are never starved by other work, and heavy requests may only use
+    a further limited share.
+    """
+    
+    def __init__(
+        self,
+        capacity: int,
+        heavy_capacity: int,
+        heavy_weight: int,
+        max_queue: int,
+        queue_timeout_seconds: float,
+        retry_after_seconds: int,
+        reserved_capacity: int = 0
+    ):
+        self.capacity = capacity
+        self.reserved_capacity = min(reserved_capacity, capacity - 1)
+        self.heavy_capacity = min(heavy_capacity, capacity)
+        self.heavy_weight = heavy_weight
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        
+        self._in_use = 0
+        self._reserved_in_use = 0
+        self._heavy_in_use = 0
+        self._queued = 0
+        self._condition = asyncio.Condition()
+    
+    def _limit(self, heavy: bool, reserved: bool) -> int:
+        limit = self.capacity if reserved else self.capacity - self.reserved_capacity
+        return min(limit, self.heavy_capacity) if heavy else limit
+    
+    def _fits(self, weight: int, heavy: bool, reserved: bool) -> bool:
+        if self._in_use + weight > self.capacity:
+            return False
+        if not reserved and self._in_use - self._reserved_in_use + weight > self.capacity - self.reserved_capacity:
+            return False
+        return not heavy or self._heavy_in_use + weight <= self.heavy_capacity
+    
+    def get_status(self) -> Dict[str, int]:
+        return {
+            'capacity': self.capacity,
+            'in_use': self._in_use,
+            'reserved_in_use': self._reserved_in_use,
+            'heavy_in_use': self._heavy_in_use,
+            'queued': self._queued
+        }
+    
+    @asynccontextmanager
+    async def admit(self, weight: int, reserved: bool = False):
+        """Hold slots for the duration of a request, waiting in the queue if needed"""
+        
+        heavy = weight >= self.heavy_weight
+        weight = min(weight, self._limit(heavy, reserved))
+        
+        async with self._condition:
+            if not self._fits(weight, heavy, reserved):
+                if self._queued >= self.max_queue:
+                    raise AdmissionRejectedError("Server is overloaded, try again later", self.retry_after_seconds)
+                
+                self._queued += 1
+                try:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(lambda: self._fits(weight, heavy, reserved)),
+                        self.queue_timeout_seconds
+                    )
+                except asyncio.TimeoutError:
+                    raise AdmissionRejectedError("Timed out waiting for capacity", self.retry_after_seconds)
+                finally:
+                    self._queued -= 1
+            
+            self._in_use += weight
+            if reserved:
+                self._reserved_in_use += weight
+            if heavy:
+                self._heavy_in_use += weight
+        
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._in_use -= weight
+                if reserved:
+                    self._reserved_in_use -= weight
+                if heavy:
+                    self._heavy_in_use -= weight
+                self._condition.notify_all()
+
+
+@lru_cache()
+def get_admission_controller() -> AdmissionController:
+    """Get the shared admission controller instance"""
+    settings = get_settings()
+    return AdmissionController(
+        capacity=settings.admission_capacity,
+        heavy_capacity=settings.admission_heavy_capacity,
+        heavy_weight=settings.admission_heavy_weight,
+        max_queue=settings.admission_max_queue,
+        queue_timeout_seconds=settings.admission_queue_timeout_seconds,
+        retry_after_seconds=settings.admission_retry_after_seconds,
+        reserved_capacity=settings.admission_detect_reserved_capacity
+    )
@@ -0,0 +1,213 @@
+"""
+Anomaly Alert Service
+"""
+import hashlib
+import json
+import os
+import threading
+import requests
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+from app.services.anomaly_detector import AnomalyDetectorService
+from app.services.cost_processor import CostProcessorService
+from app.services.query_planner import QueryPlannerService
+from app.models.responses import SubscriptionAnomalyResult
+
+
+class AnomalyAlertService:
+    """Evaluate newly landed cost data incrementally and push anomaly changes to webhooks
+    
+    Only days that are new since the last run, or whose data was restated
+    within the restatement window, are re-evaluated. A result is pushed when
+    its ``has_anomalies`` differs from the last known state.
+    """
+    
+    # Each baseline day feeds the anomaly check of the 7 days after it
+    BASELINE_DAYS = 7
+    
+    # Evaluations from the background loop and the API share one state file
+    _lock = threading.Lock()
+    
+    def __init__(
+        self,
+        query_planner: QueryPlannerService,
+        cost_processor: CostProcessorService,
+        state_path: str,
+        webhook_urls: List[str],
+        restatement_days: int = 3,
+        webhook_timeout: int = 10
+    ):
+        self.query_planner = query_planner
+        self.anomaly_detector = AnomalyDetectorService(query_planner, cost_processor)
+        self.state_path = state_path
+        self.webhook_urls = webhook_urls
+        self.restatement_days = restatement_days
+        self.webhook_timeout = webhook_timeout
+    
+    def load_state(self) -> Dict[str, Any]:
+        """Get the per-subscription evaluation state"""
+        
+        if not os.path.exists(self.state_path):
+            return {}
+        
+        with open(self.state_path) as f:
+            return json.load(f)
+    
+    def _save_state(self, state: Dict[str, Any]):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+    
+    @staticmethod
+    def _fingerprint(day_rows: List[list]) -> str:
+        """Hash a day's rows so restated data can be told apart"""
+        
+        normalized = sorted(
+            (str(row[2]) if len(row) > 2 else '', round(float(row[0]), 4))
+            for row in day_rows
+        )
+        return hashlib.sha1(json.dumps(normalized).encode()).hexdigest()
+    
+    def push(self, result: Dict[str, Any]):
+        """Send an anomaly result to every configured webhook"""
+        
+        payload = SubscriptionAnomalyResult(**result).model_dump()
+        
+        for url in self.webhook_urls:
+            try:
+                response = requests.post(url, json=payload, timeout=self.webhook_timeout)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                print(f"Failed to push anomaly alert to {url}: {str(e)}")
+    
+    def _evaluate_subscription(
+        self,
+        subscription_id: str,
+        subscription_name: str,
+        sub_state: Dict[str, Any],
+        yesterday: datetime,
+        threshold_percent: float
+    ) -> List[Dict[str, Any]]:
+        """Re-check new and restated days of one subscription, returning the pushed results"""
+        
+        last_date = sub_state.get('last_date')
+        if last_date:
+            last_date = datetime.strptime(last_date, '%Y-%m-%d')
+            check_start = min(
+                last_date + timedelta(days=1),
+                yesterday - timedelta(days=self.restatement_days - 1)
+            )
+        else:
+            check_start = yesterday
+        
+        if check_start.date() > yesterday.date():
+            return []
+        
+        # One upstream query covers the checked days and their baselines
+        self.query_planner.add(
+            subscription_id, check_start - timedelta(days=self.BASELINE_DAYS), yesterday
+        )
+        response_data = self.query_planner.get_cost_data_range(subscription_id, check_start, yesterday)
+        daily_data = self.query_planner.parse_range_response(response_data) if response_data else {}
+        
+        fingerprints = sub_state.get('fingerprints', {})
+        landed_days = []
+        changed_days = []
+        
+        date = check_start
+        while date.date() <= yesterday.date():
+            date_key = date.strftime('%Y%m%d')
+            day_rows = daily_data.get(int(date_key), [])
+            
+            # Days without rows have not landed yet
+            if day_rows:
+                landed_days.append(date)
+                fingerprint = self._fingerprint(day_rows)
+                if fingerprints.get(date_key) != fingerprint:
+                    changed_days.append(date)
+                    fingerprints[date_key] = fingerprint
+            
+            date += timedelta(days=1)
+        
+        # A changed day affects its own check and those it is a baseline for
+        days_to_check = [
+            date for date in landed_days
+            if any(changed <= date <= changed + timedelta(days=self.BASELINE_DAYS) for changed in changed_days)
+        ]
+        
+        results = sub_state.get('results', {})
+        pushed = []
+        
+        for target_date in days_to_check:
+            result = self.anomaly_detector.detect_anomalies(
+                subscription_id, subscription_name, target_date, threshold_percent
+            )
+            if not result:
+                continue
+            
+            date_str = result['target_date']
+            
+            if date_str in results:
+                previous = results[date_str]
+            elif not results or date_str > max(results):
+                # A newly landed day continues from the latest known state
+                previous = sub_state.get('has_anomalies', False)
+            else:
+                # An older day seen for the first time, e.g. once the restatement
+                # window first reaches back past it, has no state to change from
+                previous = result['has_anomalies']
+            
+            if result['has_anomalies'] != previous:
+                self.push(result)
+                pushed.append(result)
+            
+            results[date_str] = result['has_anomalies']
+            sub_state['has_anomalies'] = results[max(results)]
+        
+        if landed_days:
+            sub_state['last_date'] = max(
+                landed_days[-1].strftime('%Y-%m-%d'), sub_state.get('last_date') or ''
+            )
+        
+        # Keep only what the restatement window can still change
+        oldest_key = (yesterday - timedelta(days=self.restatement_days + self.BASELINE_DAYS)).strftime('%Y%m%d')
+        sub_state['fingerprints'] = {k: v for k, v in fingerprints.items() if k >= oldest_key}
+        oldest_date = datetime.strptime(oldest_key, '%Y%m%d').strftime('%Y-%m-%d')
+        sub_state['results'] = {k: v for k, v in results.items() if k >= oldest_date}
+        
+        return pushed
+    
+    def evaluate(
+        self,
+        subscriptions: Dict[str, str],
+        threshold_percent: float = 25.0,
+        today: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Evaluate newly landed data for all subscriptions and push changed results"""
+        
+        if today is None:
+            today = datetime.now()
+        yesterday = today - timedelta(days=1)
+        
+        with self._lock:
+            state = self.load_state()
+            pushed = []
+            
+            for sub_name in ['prod', 'dev', 'test', 'main']:
+                sub_state = state.setdefault(sub_name, {})
+                pushed += self._evaluate_subscription(
+                    subscriptions[sub_name],
+                    sub_name,
+                    sub_state,
+                    yesterday,
+                    threshold_percent
+                )
+            
+            self._save_state(state)
+        
+        return {
+            'evaluated_at': today.isoformat(),
+            'alerts_sent': len(pushed),
+            'alerts': pushed
+        }
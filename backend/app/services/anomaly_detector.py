@@ -14,6 +14,14 @@ class AnomalyDetectorService:
         self.cost_data_service = cost_data_service
         self.cost_processor = cost_processor
     
+    @staticmethod
+    def register_queries(query_planner, subscriptions: Dict[str, str], target_dates: List[datetime]):
+        """Register the cost data needed to check the given dates with a query planner"""
+        
+        for subscription_id in subscriptions.values():
+            for target_date in target_dates:
+                query_planner.add(subscription_id, target_date - timedelta(days=7), target_date)
+    
     def detect_anomalies(
         self,
         subscription_id: str,
@@ -39,7 +47,9 @@ class AnomalyDetectorService:
         
         # Process costs for each day
         weekly_costs = []
+        weekly_rows = []
         target_costs = None
+        target_rows = []
         
         for i in range(8):  # 7 days for average + 1 target day
             date = start_date + timedelta(days=i)
@@ -49,8 +59,10 @@ class AnomalyDetectorService:
             
             if i < 7:  # First 7 days for average
                 weekly_costs.append(costs)
+                weekly_rows.append(day_rows)
             else:  # 8th day is target
                 target_costs = costs
+                target_rows = day_rows
         
         # Calculate averages
         categories = ['Databricks', 'Virtual Machine', 'Storage', 'Others', 'Total']
@@ -87,7 +99,10 @@ class AnomalyDetectorService:
                     'category': category,
                     'average_cost': round(avg_cost, 2),
                     'current_cost': round(current_cost, 2),
-                    'percent_change': round(percent_change, 2)
+                    'percent_change': round(percent_change, 2),
+                    'drivers': self.cost_processor.calculate_cost_drivers(
+                        weekly_rows, target_rows, category
+                    )
                 })
         
         return {
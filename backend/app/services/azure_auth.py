@@ -1,9 +1,9 @@
 """
 Azure Authentication Service
 """
-import requests
 from typing import Optional
 from app.config import Settings
+from app.services.resilience import get_upstream_client
 
 
 class AzureAuthService:
@@ -13,8 +13,8 @@ class AzureAuthService:
         self.settings = settings
         self._access_token: Optional[str] = None
     
-    def get_access_token(self) -> str:
-        """Get or refresh Azure AD access token"""
+    def get_access_token(self, deadline: Optional[float] = None) -> str:
+        """Get or refresh Azure AD access token within the caller's deadline"""
         if self._access_token:
             return self._access_token
         
@@ -27,7 +27,7 @@ class AzureAuthService:
         }
         
         try:
-            response = requests.post(auth_url, data=auth_data, timeout=30)
+            response = get_upstream_client().post('login', auth_url, deadline=deadline, data=auth_data)
             response.raise_for_status()
             self._access_token = response.json()['access_token']
             return self._access_token
@@ -0,0 +1,260 @@
+"""
+Historical Cost Backfill Service
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+from app.services.cost_data import CostDataService
+
+
+# Cost Management keeps roughly 13 months of usage history
+MAX_BACKFILL_MONTHS = 13
+
+
+def subtract_months(date: datetime, months: int) -> datetime:
+    """Move a date back by whole months, clamping the day to the target month"""
+    
+    month_index = date.year * 12 + date.month - 1 - months
+    year, month = divmod(month_index, 12)
+    month += 1
+    
+    next_month = datetime(year + month // 12, month % 12 + 1, 1)
+    last_day = (next_month - timedelta(days=1)).day
+    
+    return date.replace(year=year, month=month, day=min(date.day, last_day))
+
+
+def split_by_month(start_date: datetime, end_date: datetime) -> List[Tuple[datetime, datetime]]:
+    """Split a date range into calendar month chunks
+    
+    Month-aligned chunks keep the same ids across runs started on different
+    days, so earlier checkpoints stay valid.
+    """
+    
+    chunks = []
+    chunk_start = start_date
+    
+    while chunk_start.date() <= end_date.date():
+        next_month = datetime(chunk_start.year + chunk_start.month // 12, chunk_start.month % 12 + 1, 1)
+        chunk_end = min(next_month - timedelta(days=1), end_date)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = next_month
+    
+    return chunks
+
+
+class BackfillService:
+    """Fetch long cost histories in parallel monthly chunks into a local columnar store
+    
+    Each chunk is written as its own column-oriented JSON file and recorded in
+    a checkpoint file, so an interrupted run resumes with the missing chunks.
+    """
+    
+    CHECKPOINT_FILE = 'checkpoint.json'
+    
+    def __init__(
+        self,
+        cost_data_service: CostDataService,
+        store_directory: str,
+        max_workers: int = 4,
+        min_interval_seconds: float = 2.0
+    ):
+        self.cost_data_service = cost_data_service
+        self.store_directory = store_directory
+        self.max_workers = max_workers
+        self.min_interval_seconds = min_interval_seconds
+        
+        self._checkpoint_lock = threading.Lock()
+        self._rate_lock = threading.Lock()
+        self._last_request_at = 0.0
+    
+    @staticmethod
+    def _chunk_id(start_date: datetime, end_date: datetime) -> str:
+        return f"{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
+    
+    def _checkpoint_path(self) -> str:
+        return os.path.join(self.store_directory, self.CHECKPOINT_FILE)
+    
+    def _chunk_path(self, subscription_name: str, chunk_id: str) -> str:
+        return os.path.join(self.store_directory, subscription_name, f"{chunk_id}.json")
+    
+    @staticmethod
+    def _write_json(path: str, data: Any):
+        """Write a file atomically so an interrupted run never leaves it half written"""
+        
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    
+    def load_checkpoint(self) -> Dict[str, List[str]]:
+        """Get the completed chunk ids per subscription"""
+        
+        path = self._checkpoint_path()
+        if not os.path.exists(path):
+            return {}
+        
+        with open(path) as f:
+            return json.load(f)
+    
+    def _mark_done(self, subscription_name: str, chunk_id: str):
+        with self._checkpoint_lock:
+            checkpoint = self.load_checkpoint()
+            done = checkpoint.setdefault(subscription_name, [])
+            if chunk_id not in done:
+                done.append(chunk_id)
+                done.sort()
+            self._write_json(self._checkpoint_path(), checkpoint)
+    
+    def _wait_for_rate_limit(self):
+        """Space out request starts across all workers"""
+        
+        with self._rate_lock:
+            wait = self._last_request_at + self.min_interval_seconds - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request_at = time.monotonic()
+    
+    @staticmethod
+    def to_columnar(response_data: Dict[str, Any]) -> Dict[str, list]:
+        """Convert a row-oriented query response into column arrays"""
+        
+        names = [col['name'] for col in response_data.get('columns', [])]
+        rows = response_data.get('rows', [])
+        
+        return {name: [row[i] for row in rows] for i, name in enumerate(names)}
+    
+    def _fetch_chunk(
+        self,
+        subscription_id: str,
+        subscription_name: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> str:
+        chunk_id = self._chunk_id(start_date, end_date)
+        
+        self._wait_for_rate_limit()
+        response_data = self.cost_data_service.get_cost_data_range(
+            subscription_id, start_date, end_date
+        ) or {}
+        
+        os.makedirs(os.path.join(self.store_directory, subscription_name), exist_ok=True)
+        self._write_json(
+            self._chunk_path(subscription_name, chunk_id),
+            self.to_columnar(response_data)
+        )
+        self._mark_done(subscription_name, chunk_id)
+        
+        return chunk_id
+    
+    def run(
+        self,
+        subscriptions: Dict[str, str],
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict[str, Any]:
+        """Backfill all subscriptions, skipping chunks finished by earlier runs"""
+        
+        if start_date < subtract_months(end_date, MAX_BACKFILL_MONTHS):
+            raise ValueError(f"Backfill range cannot exceed {MAX_BACKFILL_MONTHS} months")
+        
+        checkpoint = self.load_checkpoint()
+        chunks = split_by_month(start_date, end_date)
+        
+        pending = []
+        skipped = 0
+        for sub_name, subscription_id in subscriptions.items():
+            done = set(checkpoint.get(sub_name, []))
+            for chunk_start, chunk_end in chunks:
+                if self._chunk_id(chunk_start, chunk_end) in done:
+                    skipped += 1
+                else:
+                    pending.append((subscription_id, sub_name, chunk_start, chunk_end))
+        
+        completed = []
+        failed = []
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._fetch_chunk, *task): task
+                for task in pending
+            }
+            
+            for future in as_completed(futures):
+                _, sub_name, chunk_start, chunk_end = futures[future]
+                chunk_id = self._chunk_id(chunk_start, chunk_end)
+                
+                try:
+                    future.result()
+                    completed.append(f"{sub_name}/{chunk_id}")
+                    print(f"Backfilled {sub_name} {chunk_id}")
+                except Exception as e:
+                    failed.append({'chunk': f"{sub_name}/{chunk_id}", 'error': str(e)})
+                    print(f"Failed to backfill {sub_name} {chunk_id}: {str(e)}")
+        
+        return {
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d'),
+            'completed': sorted(completed),
+            'skipped': skipped,
+            'failed': failed
+        }
+    
+    def load_range(
+        self,
+        subscription_name: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[Dict[str, Any]]:
+        """Read stored rows for a date range back into a query response shape"""
+        
+        sub_directory = os.path.join(self.store_directory, subscription_name)
+        if not os.path.isdir(sub_directory):
+            return None
+        
+        start_key = int(start_date.strftime('%Y%m%d'))
+        end_key = int(end_date.strftime('%Y%m%d'))
+        
+        # A partial month may have been fetched again by a later run, keep its widest chunk
+        chunk_files = {}
+        for filename in os.listdir(sub_directory):
+            if not filename.endswith('.json'):
+                continue
+            
+            chunk_start, chunk_end = (int(part) for part in filename[:-len('.json')].split('_'))
+            if chunk_end < start_key or chunk_start > end_key:
+                continue
+            
+            month = chunk_start // 100
+            span = chunk_end - chunk_start
+            if month not in chunk_files or chunk_files[month][0] < span:
+                chunk_files[month] = (span, filename)
+        
+        names = None
+        rows = []
+        
+        for month in sorted(chunk_files):
+            with open(os.path.join(sub_directory, chunk_files[month][1])) as f:
+                columns = json.load(f)
+            
+            if not columns:
+                continue
+            
+            names = names or list(columns.keys())
+            dates = columns.get('UsageDate', [])
+            
+            for i, date in enumerate(dates):
+                if start_key <= date <= end_key:
+                    rows.append([columns[name][i] for name in names])
+        
+        if names is None:
+            return None
+        
+        return {
+            'columns': [{'name': name} for name in names],
+            'rows': rows
+        }
@@ -4,14 +4,43 @@ Azure Cost Data Fetching Service
 import requests
 import time
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from app.services.resilience import (
+    UpstreamClient, ResponseCache, CircuitOpenError, DeadlineExceededError, RateLimitedError,
+    get_upstream_client, get_response_cache, remaining_seconds
+)
+
+
+DEFAULT_GROUPING = ['ResourceType']
+
+
+def build_grouping(dimensions: List[str]) -> List[Dict[str, str]]:
+    """Build the query grouping clause, 'tag:<key>' entries group by tag"""
+    
+    grouping = []
+    for dimension in dimensions:
+        if dimension.startswith('tag:'):
+            grouping.append({'type': 'TagKey', 'name': dimension[len('tag:'):]})
+        else:
+            grouping.append({'type': 'Dimension', 'name': dimension})
+    
+    return grouping
 
 
 class CostDataService:
     """Fetch cost data from Azure Cost Management API"""
     
-    def __init__(self, access_token: str):
+    def __init__(
+        self,
+        access_token: str,
+        deadline: Optional[float] = None,
+        upstream_client: Optional[UpstreamClient] = None,
+        response_cache: Optional[ResponseCache] = None
+    ):
         self.access_token = access_token
+        self.deadline = deadline
+        self.upstream_client = upstream_client or get_upstream_client()
+        self.response_cache = response_cache or get_response_cache()
     
     def get_cost_data_range(
         self, 
@@ -19,9 +48,13 @@ class CostDataService:
         start_date: datetime, 
         end_date: datetime,
         retry_count: int = 0,
-        max_retries: int = 3
+        max_retries: int = 3,
+        dimensions: Optional[List[str]] = None
     ) -> Optional[Dict[str, Any]]:
-        """Get cost data for a date range"""
+        """Get cost data for a date range, grouped by the given dimensions"""
+        
+        if dimensions is None:
+            dimensions = DEFAULT_GROUPING
         
         usage_url = f'https://management.azure.com/subscriptions/{subscription_id}/providers/Microsoft.CostManagement/query?api-version=2023-03-01'
         
@@ -40,41 +73,68 @@ class CostDataService:
                         'function': 'Sum'
                     }
                 },
-                'grouping': [
-                    {
-                        'type': 'Dimension',
-                        'name': 'ResourceType'
-                    }
-                ]
+                'grouping': build_grouping(dimensions)
             }
         }
         
+        cache_key = (subscription_id, usage_data['timePeriod']['from'], usage_data['timePeriod']['to'], tuple(dimensions))
+        
         try:
-            response = requests.post(
-                usage_url,
-                headers={'Authorization': f'Bearer {self.access_token}'},
-                json=usage_data,
-                timeout=30
-            )
+            properties = self._post_query(subscription_id, usage_url, usage_data, retry_count, max_retries)
             
-            # Handle rate limiting
-            if response.status_code == 429:
-                if retry_count < max_retries:
-                    retry_after = int(response.headers.get('Retry-After', 2 ** retry_count))
-                    print(f"Rate limit hit. Waiting {retry_after} seconds...")
-                    time.sleep(retry_after)
-                    return self.get_cost_data_range(
-                        subscription_id, start_date, end_date, retry_count + 1, max_retries
-                    )
-                else:
-                    raise Exception("Max retries reached due to rate limiting")
+            # Large results are split into pages, each linking to the next
+            next_link = properties.pop('nextLink', None)
+            while next_link:
+                page = self._post_query(subscription_id, next_link, usage_data, 0, max_retries)
+                properties['rows'] = properties.get('rows', []) + page.get('rows', [])
+                next_link = page.get('nextLink')
             
-            response.raise_for_status()
-            return response.json()['properties']
+            self.response_cache.put(cache_key, properties)
+            return properties
+            
+        except (requests.exceptions.RequestException, CircuitOpenError, DeadlineExceededError, RateLimitedError) as e:
+            # Serve the last good response while upstream is degraded
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                print(f"Serving cached cost data for {subscription_id}: {str(e)}")
+                return cached
             
-        except requests.exceptions.RequestException as e:
             raise Exception(f"Error fetching cost data: {str(e)}")
     
+    def _post_query(
+        self,
+        subscription_id: str,
+        url: str,
+        usage_data: Dict[str, Any],
+        retry_count: int,
+        max_retries: int
+    ) -> Dict[str, Any]:
+        """Post a query or page request, retrying while rate limited"""
+        
+        response = self.upstream_client.post(
+            f'{subscription_id}/query',
+            url,
+            deadline=self.deadline,
+            headers={'Authorization': f'Bearer {self.access_token}'},
+            json=usage_data
+        )
+        
+        # Handle rate limiting
+        if response.status_code == 429:
+            if retry_count < max_retries:
+                retry_after = int(response.headers.get('Retry-After', 2 ** retry_count))
+                remaining = remaining_seconds(self.deadline)
+                if remaining is not None and retry_after >= remaining:
+                    raise DeadlineExceededError("Request deadline exceeded while rate limited")
+                print(f"Rate limit hit. Waiting {retry_after} seconds...")
+                time.sleep(retry_after)
+                return self._post_query(subscription_id, url, usage_data, retry_count + 1, max_retries)
+            else:
+                raise RateLimitedError("Max retries reached due to rate limiting")
+        
+        response.raise_for_status()
+        return response.json()['properties']
+    
     def parse_range_response(self, response_data: Dict[str, Any]) -> Dict[int, list]:
         """Parse the range API response and organize by date"""
         
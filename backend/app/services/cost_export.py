@@ -0,0 +1,341 @@
+"""
+Azure Cost Export File Service
+"""
+import csv
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+from app.services.cost_data import DEFAULT_GROUPING
+
+
+# Export column names differ between billing account types and export versions
+COLUMN_ALIASES = {
+    'Cost': ['costinbillingcurrency', 'pretaxcost', 'cost', 'costinusd'],
+    'Date': ['date', 'usagedate', 'usagedatetime'],
+    'Currency': ['billingcurrencycode', 'billingcurrency', 'currency'],
+    'SubscriptionId': ['subscriptionid', 'subscriptionguid'],
+    'ResourceType': ['resourcetype'],
+    'ResourceGroup': ['resourcegroupname', 'resourcegroup'],
+    'MeterCategory': ['metercategory'],
+    'ResourceLocation': ['resourcelocation', 'location'],
+    'ServiceName': ['servicename', 'consumedservice'],
+    'ResourceId': ['resourceid', 'instanceid', 'instancename'],
+    'Tags': ['tags']
+}
+
+# Export folders are named after the period they cover, e.g. 20261001-20261031
+PERIOD_PATTERN = re.compile(r'(\d{8})-(\d{8})')
+
+
+def parse_export_date(value: str) -> Optional[int]:
+    """Parse an export date cell into a YYYYMMDD key"""
+    
+    value = value.strip()[:10]
+    for date_format in ('%Y-%m-%d', '%m/%d/%Y', '%Y%m%d'):
+        try:
+            return int(datetime.strptime(value, date_format).strftime('%Y%m%d'))
+        except ValueError:
+            continue
+    
+    return None
+
+
+def parse_tags(value: str) -> Dict[str, str]:
+    """Parse an export tags cell, which may omit the surrounding braces"""
+    
+    value = value.strip()
+    if not value:
+        return {}
+    
+    if not value.startswith('{'):
+        value = '{' + value + '}'
+    
+    try:
+        tags = json.loads(value)
+    except ValueError:
+        return {}
+    
+    return {str(key).lower(): str(tag_value) for key, tag_value in tags.items()}
+
+
+class CostExportService:
+    """Read cost data from scheduled Azure cost export CSVs on local disk
+    
+    Stands in for ``CostDataService``: ``get_cost_data_range`` streams only the
+    export files that cover the requested days and returns rows in the same
+    shape as the Cost Management query API.
+    """
+    
+    INDEX_FILE = '.cost_export_index.json'
+    
+    def __init__(self, export_directory: str):
+        self.export_directory = export_directory
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+    
+    @staticmethod
+    def _header_map(header: List[str]) -> Dict[str, int]:
+        """Map canonical column names to their positions in an export header"""
+        
+        positions = {name.strip().lower(): i for i, name in enumerate(header)}
+        
+        header_map = {}
+        for canonical, aliases in COLUMN_ALIASES.items():
+            for alias in aliases:
+                if alias in positions:
+                    header_map[canonical] = positions[alias]
+                    break
+        
+        return header_map
+    
+    def _scan_dates(self, path: str) -> Tuple[Optional[int], Optional[int]]:
+        """Read a file once to find the date range it covers"""
+        
+        first = last = None
+        
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header_map = self._header_map(next(reader, []))
+            date_idx = header_map.get('Date')
+            if date_idx is None:
+                return None, None
+            
+            for row in reader:
+                date = parse_export_date(row[date_idx]) if len(row) > date_idx else None
+                if date is None:
+                    continue
+                first = date if first is None else min(first, date)
+                last = date if last is None else max(last, date)
+        
+        return first, last
+    
+    def build_index(self) -> Dict[str, Dict[str, Any]]:
+        """Index export files by the dates they cover, reusing cached entries"""
+        
+        index_path = os.path.join(self.export_directory, self.INDEX_FILE)
+        
+        cached = {}
+        if os.path.exists(index_path):
+            try:
+                with open(index_path) as f:
+                    cached = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable cost export index: {str(e)}")
+        
+        index = {}
+        for root, _, filenames in os.walk(self.export_directory):
+            for filename in filenames:
+                if not filename.lower().endswith('.csv'):
+                    continue
+                
+                path = os.path.join(root, filename)
+                relative_path = os.path.relpath(path, self.export_directory)
+                stat = os.stat(path)
+                
+                entry = cached.get(relative_path)
+                if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                    index[relative_path] = entry
+                    continue
+                
+                # Only the first pass over an unrecognized file needs a full scan
+                match = PERIOD_PATTERN.search(relative_path)
+                if match:
+                    start, end = int(match.group(1)), int(match.group(2))
+                else:
+                    start, end = self._scan_dates(path)
+                
+                if start is None:
+                    continue
+                
+                index[relative_path] = {
+                    'mtime': stat.st_mtime,
+                    'size': stat.st_size,
+                    'start': start,
+                    'end': end
+                }
+        
+        # The export directory may be a read-only sync target, the index then
+        # only lives for this instance
+        if index != cached:
+            tmp_path = f"{index_path}.tmp"
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(index, f)
+                os.replace(tmp_path, index_path)
+            except OSError as e:
+                print(f"Could not save cost export index: {str(e)}")
+        
+        self._index = index
+        return index
+    
+    @staticmethod
+    def _export_name(relative_path: str) -> str:
+        """Get the export a file belongs to, i.e. its path above the period folder"""
+        
+        match = PERIOD_PATTERN.search(relative_path)
+        if match:
+            return relative_path[:match.start()]
+        return os.path.dirname(relative_path)
+    
+    @staticmethod
+    def _run_name(relative_path: str) -> str:
+        """Get the export run a file belongs to
+        
+        Partitioned exports write each run into its own folder below the period
+        folder, older exports write each run as a single file in the period folder.
+        """
+        
+        directory = os.path.dirname(relative_path)
+        if PERIOD_PATTERN.fullmatch(os.path.basename(directory)):
+            return relative_path
+        return directory
+    
+    def select_files(self, start_date: datetime, end_date: datetime) -> Dict[str, List[int]]:
+        """Pick the files of the newest export run covering each day in the range"""
+        
+        index = self._index if self._index is not None else self.build_index()
+        
+        selected: Dict[str, List[int]] = {}
+        date = start_date
+        while date.date() <= end_date.date():
+            date_key = int(date.strftime('%Y%m%d'))
+            
+            # Month-to-date exports are rewritten daily, so per export the newest
+            # run wins, and all partitioned files of that run are read
+            runs: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for path, entry in index.items():
+                if not entry['start'] <= date_key <= entry['end']:
+                    continue
+                
+                export_runs = runs.setdefault(self._export_name(path), {})
+                run = export_runs.setdefault(self._run_name(path), {'mtime': 0, 'paths': []})
+                run['mtime'] = max(run['mtime'], entry['mtime'])
+                run['paths'].append(path)
+            
+            for export_runs in runs.values():
+                newest_run = max(export_runs.values(), key=lambda run: run['mtime'])
+                for path in newest_run['paths']:
+                    selected.setdefault(path, []).append(date_key)
+            
+            date += timedelta(days=1)
+        
+        return selected
+    
+    def get_cost_data_range(
+        self,
+        subscription_id: str,
+        start_date: datetime,
+        end_date: datetime,
+        retry_count: int = 0,
+        max_retries: int = 3,
+        dimensions: Optional[List[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get cost data for a date range, grouped by the given dimensions"""
+        
+        if dimensions is None:
+            dimensions = DEFAULT_GROUPING
+        
+        selected = self.select_files(start_date, end_date)
+        if not selected:
+            return None
+        
+        totals: Dict[Tuple, float] = {}
+        
+        for relative_path, date_keys in selected.items():
+            self._aggregate_file(
+                os.path.join(self.export_directory, relative_path),
+                subscription_id.lower(),
+                set(date_keys),
+                dimensions,
+                totals
+            )
+        
+        columns = [
+            {'name': 'Cost', 'type': 'Number'},
+            {'name': 'UsageDate', 'type': 'Number'}
+        ]
+        for dimension in dimensions:
+            if dimension.startswith('tag:'):
+                columns += [{'name': 'TagKey', 'type': 'String'}, {'name': 'TagValue', 'type': 'String'}]
+            else:
+                columns.append({'name': dimension, 'type': 'String'})
+        columns.append({'name': 'Currency', 'type': 'String'})
+        
+        return {
+            'columns': columns,
+            'rows': [[cost, *key] for key, cost in totals.items()]
+        }
+    
+    def _aggregate_file(
+        self,
+        path: str,
+        subscription_id: str,
+        date_keys: set,
+        dimensions: List[str],
+        totals: Dict[Tuple, float]
+    ):
+        """Stream one export file and sum its costs into totals"""
+        
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header_map = self._header_map(next(reader, []))
+            
+            cost_idx = header_map.get('Cost')
+            date_idx = header_map.get('Date')
+            if cost_idx is None or date_idx is None:
+                return
+            
+            sub_idx = header_map.get('SubscriptionId')
+            currency_idx = header_map.get('Currency')
+            tags_idx = header_map.get('Tags')
+            dimension_idxs = [header_map.get(dimension) for dimension in dimensions]
+            
+            # Rows cut short by a partly synced file are skipped
+            used_idxs = [cost_idx, date_idx, sub_idx, currency_idx, *dimension_idxs]
+            if any(dimension.startswith('tag:') for dimension in dimensions):
+                used_idxs.append(tags_idx)
+            min_length = max(idx for idx in used_idxs if idx is not None) + 1
+            
+            for row in reader:
+                if len(row) < min_length:
+                    continue
+                
+                if sub_idx is not None and row[sub_idx].lower() != subscription_id:
+                    continue
+                
+                date = parse_export_date(row[date_idx])
+                if date not in date_keys:
+                    continue
+                
+                values = []
+                for dimension, idx in zip(dimensions, dimension_idxs):
+                    if dimension.startswith('tag:'):
+                        tag_key = dimension[len('tag:'):]
+                        tags = parse_tags(row[tags_idx]) if tags_idx is not None else {}
+                        if tag_key.lower() in tags:
+                            values += [tag_key, tags[tag_key.lower()]]
+                        else:
+                            values += ['', '']
+                    else:
+                        values.append(row[idx] if idx is not None else '')
+                
+                currency = row[currency_idx] if currency_idx is not None else ''
+                key = (date, *values, currency)
+                
+                try:
+                    totals[key] = totals.get(key, 0.0) + float(row[cost_idx] or 0)
+                except ValueError:
+                    continue
+    
+    def parse_range_response(self, response_data: Dict[str, Any]) -> Dict[int, list]:
+        """Parse the range response and organize by date"""
+        
+        if not response_data or 'rows' not in response_data:
+            return {}
+        
+        daily_data = {}
+        for row in response_data['rows']:
+            daily_data.setdefault(row[1], []).append(row)
+        
+        return daily_data
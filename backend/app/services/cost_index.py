@@ -0,0 +1,323 @@
+"""
+Cost Range Index Service
+"""
+import calendar
+import threading
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Optional, Any
+from app.services.cost_processor import CostProcessorService
+
+
+CATEGORIES = ['Databricks', 'Virtual Machine', 'Storage', 'Others', 'Total']
+
+
+def week_key(day: date) -> str:
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def month_key(day: date) -> str:
+    return day.strftime('%Y-%m')
+
+
+class CostIndexService:
+    """Answer cost range queries in constant time from precomputed prefix sums
+    
+    Daily per-subscription, per-category costs are kept in contiguous arrays
+    with cumulative sums, alongside weekly and monthly rollups. New days are
+    appended in place; a restated day only recomputes the sums after it.
+    Updates and reads share one lock, so a query never sees half-recomputed sums.
+    """
+    
+    def __init__(self, cost_processor: CostProcessorService):
+        self.cost_processor = cost_processor
+        self._subscriptions: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._refresh_locks: Dict[str, threading.Lock] = {}
+    
+    @staticmethod
+    def _empty_index(base: date) -> Dict[str, Any]:
+        return {
+            'base': base,
+            'daily': {category: [] for category in CATEGORIES},
+            'prefix': {category: [0.0] for category in CATEGORIES},
+            'weekly': {category: {} for category in CATEGORIES},
+            'monthly': {category: {} for category in CATEGORIES},
+            'last_refresh': 0.0
+        }
+    
+    def _rebase(self, index: Dict[str, Any], base: date) -> Dict[str, Any]:
+        """Move an index's first day earlier, keeping its data"""
+        
+        rebased = self._empty_index(base)
+        offset = (index['base'] - base).days
+        
+        for category in CATEGORIES:
+            daily = [0.0] * offset + index['daily'][category]
+            rebased['daily'][category] = daily
+            rebased['weekly'][category] = index['weekly'][category]
+            rebased['monthly'][category] = index['monthly'][category]
+            
+            prefix = [0.0]
+            for cost in daily:
+                prefix.append(prefix[-1] + cost)
+            rebased['prefix'][category] = prefix
+        
+        rebased['last_refresh'] = index['last_refresh']
+        return rebased
+    
+    def update(self, subscription_name: str, daily_costs: Dict[date, Dict[str, float]]):
+        """Add or restate days for a subscription"""
+        
+        if not daily_costs:
+            return
+        
+        with self._lock:
+            index = self._subscriptions.get(subscription_name)
+            first_day = min(daily_costs)
+            
+            if index is None:
+                index = self._empty_index(first_day)
+            elif first_day < index['base']:
+                index = self._rebase(index, first_day)
+            
+            self._subscriptions[subscription_name] = index
+            
+            # Sums after the earliest changed position are recomputed once at the end
+            first_changed = None
+            
+            for day in sorted(daily_costs):
+                position = (day - index['base']).days
+                costs = daily_costs[day]
+                
+                for category in CATEGORIES:
+                    daily = index['daily'][category]
+                    prefix = index['prefix'][category]
+                    
+                    while len(daily) <= position:
+                        daily.append(0.0)
+                        prefix.append(prefix[-1])
+                    
+                    delta = costs.get(category, 0.0) - daily[position]
+                    daily[position] = costs.get(category, 0.0)
+                    
+                    weekly = index['weekly'][category]
+                    weekly[week_key(day)] = weekly.get(week_key(day), 0.0) + delta
+                    monthly = index['monthly'][category]
+                    monthly[month_key(day)] = monthly.get(month_key(day), 0.0) + delta
+                
+                if first_changed is None:
+                    first_changed = position
+            
+            for category in CATEGORIES:
+                daily = index['daily'][category]
+                prefix = index['prefix'][category]
+                for position in range(first_changed, len(daily)):
+                    prefix[position + 1] = prefix[position] + daily[position]
+    
+    def _to_daily_costs(self, daily_data: Dict[int, list]) -> Dict[date, Dict[str, float]]:
+        """Categorize parsed rows into per-day category costs"""
+        
+        daily_costs = {}
+        for date_key, day_rows in daily_data.items():
+            day = datetime.strptime(str(date_key), '%Y%m%d').date()
+            daily_costs[day] = self.cost_processor.process_cost_data(day_rows)
+        
+        return daily_costs
+    
+    def refresh(
+        self,
+        cost_data_service,
+        subscriptions: Dict[str, str],
+        initial_days: int,
+        restatement_days: int,
+        today: Optional[datetime] = None,
+        backfill_service=None
+    ):
+        """Load days that are new or still within the restatement window
+        
+        An empty index is seeded from the backfill store when one is given,
+        so only the days after the stored history are queried upstream.
+        """
+        
+        if today is None:
+            today = datetime.now()
+        yesterday = today - timedelta(days=1)
+        
+        for sub_name, subscription_id in subscriptions.items():
+            if self.last_day(sub_name) is None and backfill_service is not None:
+                stored = backfill_service.load_range(
+                    sub_name, yesterday - timedelta(days=initial_days - 1), yesterday
+                )
+                if stored:
+                    self.update(sub_name, self._to_daily_costs(cost_data_service.parse_range_response(stored)))
+            
+            last_day = self.last_day(sub_name)
+            
+            if last_day is None:
+                start_date = yesterday - timedelta(days=initial_days - 1)
+            else:
+                start_date = datetime.combine(last_day, datetime.min.time()) - timedelta(days=restatement_days - 1)
+                start_date = min(start_date, yesterday)
+            
+            response_data = cost_data_service.get_cost_data_range(subscription_id, start_date, yesterday)
+            daily_data = cost_data_service.parse_range_response(response_data) if response_data else {}
+            daily_costs = self._to_daily_costs(daily_data)
+            
+            # Indexed days that no longer have rows were restated to zero
+            if response_data is not None and last_day is not None:
+                day = start_date.date()
+                while day <= min(last_day, yesterday.date()):
+                    daily_costs.setdefault(day, {})
+                    day += timedelta(days=1)
+            
+            self.update(sub_name, daily_costs)
+            
+            # A subscription without any rows yet is still recorded as refreshed
+            with self._lock:
+                index = self._subscriptions.setdefault(sub_name, self._empty_index(start_date.date()))
+                index['last_refresh'] = time.time()
+    
+    def refresh_if_stale(
+        self,
+        subscription_name: str,
+        max_age_seconds: float,
+        cost_data_service,
+        subscriptions: Dict[str, str],
+        initial_days: int,
+        restatement_days: int,
+        backfill_service=None
+    ) -> bool:
+        """Refresh a subscription once its data is older than the given age
+        
+        Concurrent callers for the same subscription wait for a single refresh
+        instead of each querying upstream.
+        """
+        
+        with self._lock:
+            refresh_lock = self._refresh_locks.setdefault(subscription_name, threading.Lock())
+        
+        with refresh_lock:
+            since_refresh = self.seconds_since_refresh(subscription_name)
+            if since_refresh is not None and since_refresh <= max_age_seconds:
+                return False
+            
+            self.refresh(
+                cost_data_service,
+                subscriptions,
+                initial_days,
+                restatement_days,
+                backfill_service=backfill_service
+            )
+            return True
+    
+    def first_day(self, subscription_name: str) -> Optional[date]:
+        """Get the earliest indexed day of a subscription"""
+        
+        with self._lock:
+            index = self._subscriptions.get(subscription_name)
+            if index is None or not index['daily']['Total']:
+                return None
+            
+            return index['base']
+    
+    def last_day(self, subscription_name: str) -> Optional[date]:
+        """Get the latest indexed day of a subscription"""
+        
+        with self._lock:
+            index = self._subscriptions.get(subscription_name)
+            if index is None or not index['daily']['Total']:
+                return None
+            
+            return index['base'] + timedelta(days=len(index['daily']['Total']) - 1)
+    
+    def seconds_since_refresh(self, subscription_name: str) -> Optional[float]:
+        with self._lock:
+            index = self._subscriptions.get(subscription_name)
+            if index is None:
+                return None
+            return time.time() - index['last_refresh']
+    
+    def _get_index(self, subscription_name: str) -> Dict[str, Any]:
+        index = self._subscriptions.get(subscription_name)
+        if index is None:
+            raise ValueError(f"No cost data indexed for subscription: {subscription_name}")
+        return index
+    
+    def range_total(self, subscription_name: str, category: str, start: date, end: date) -> float:
+        """Get the total cost between two indexed days, inclusive"""
+        
+        if category not in CATEGORIES:
+            raise ValueError(f"Unknown category: {category}")
+        if start > end:
+            raise ValueError("Start date must not be after end date")
+        
+        with self._lock:
+            index = self._get_index(subscription_name)
+            prefix = index['prefix'][category]
+            
+            # Days outside the index are unknown rather than free
+            start_position = (start - index['base']).days
+            end_position = (end - index['base']).days + 1
+            if start_position < 0 or end_position > len(prefix) - 1:
+                last_day = index['base'] + timedelta(days=len(prefix) - 2)
+                raise ValueError(
+                    f"Cost data is only indexed from {index['base'].strftime('%Y-%m-%d')} "
+                    f"to {last_day.strftime('%Y-%m-%d')}"
+                )
+            
+            return prefix[end_position] - prefix[start_position]
+    
+    def rollups(self, subscription_name: str, category: str, period: str) -> Dict[str, float]:
+        """Get weekly or monthly totals"""
+        
+        if category not in CATEGORIES:
+            raise ValueError(f"Unknown category: {category}")
+        if period not in ('week', 'month'):
+            raise ValueError("Period must be 'week' or 'month'")
+        
+        with self._lock:
+            index = self._get_index(subscription_name)
+            rollup = index['weekly' if period == 'week' else 'monthly'][category]
+            
+            return dict(sorted(rollup.items()))
+    
+    def budget_status(self, subscription_name: str, category: str, budget: float) -> Dict[str, Any]:
+        """Compare month-to-date cost against a monthly budget"""
+        
+        last_day = self.last_day(subscription_name)
+        if last_day is None:
+            raise ValueError(f"No cost data indexed for subscription: {subscription_name}")
+        
+        month_start = last_day.replace(day=1)
+        if month_start < self.first_day(subscription_name):
+            raise ValueError(
+                f"Month-to-date cost needs data from {month_start.strftime('%Y-%m-%d')}, "
+                f"the index starts on {self.first_day(subscription_name).strftime('%Y-%m-%d')}"
+            )
+        
+        month_to_date = self.range_total(subscription_name, category, month_start, last_day)
+        
+        days_in_month = calendar.monthrange(last_day.year, last_day.month)[1]
+        projected = month_to_date / last_day.day * days_in_month
+        
+        return {
+            'subscription': subscription_name,
+            'category': category,
+            'month': month_key(last_day),
+            'through_date': last_day.strftime('%Y-%m-%d'),
+            'month_to_date': round(month_to_date, 2),
+            'projected': round(projected, 2),
+            'budget': budget,
+            'percent_used': round(month_to_date / budget * 100, 2) if budget else None,
+            'over_budget': month_to_date > budget,
+            'projected_over_budget': projected > budget
+        }
+
+
+@lru_cache()
+def get_cost_index() -> CostIndexService:
+    """Get the shared cost index instance"""
+    return CostIndexService(CostProcessorService())
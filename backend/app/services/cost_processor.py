@@ -1,12 +1,27 @@
 """
 Cost Data Processing Service
 """
-from typing import Dict, List
+from typing import Dict, List, Any
 
 
 class CostProcessorService:
     """Process and categorize cost data"""
     
+    @staticmethod
+    def categorize_resource_type(resource_type: str) -> str:
+        """Get the cost category of a resource type"""
+        
+        resource_type = resource_type.lower()
+        
+        if 'databricks/workspaces' in resource_type or 'databricks/workspace' in resource_type:
+            return 'Databricks'
+        elif 'compute/virtualmachines' in resource_type or 'microsoft.compute/virtualmachines' in resource_type:
+            return 'Virtual Machine'
+        elif 'storage/storageaccounts' in resource_type or 'microsoft.storage/storageaccounts' in resource_type:
+            return 'Storage'
+        
+        return 'Others'
+    
     @staticmethod
     def process_cost_data(raw_data: List[list]) -> Dict[str, float]:
         """Process raw cost data into categories"""
@@ -21,21 +36,63 @@ class CostProcessorService:
         
         for row in raw_data:
             cost = float(row[0])
-            resource_type = row[2].lower() if len(row) > 2 else ''
-            
-            if 'databricks/workspaces' in resource_type or 'databricks/workspace' in resource_type:
-                costs['Databricks'] += cost
-            elif 'compute/virtualmachines' in resource_type or 'microsoft.compute/virtualmachines' in resource_type:
-                costs['Virtual Machine'] += cost
-            elif 'storage/storageaccounts' in resource_type or 'microsoft.storage/storageaccounts' in resource_type:
-                costs['Storage'] += cost
-            else:
-                costs['Others'] += cost
+            resource_type = row[2] if len(row) > 2 else ''
             
+            costs[CostProcessorService.categorize_resource_type(resource_type)] += cost
             costs['Total'] += cost
         
         return costs
     
+    @staticmethod
+    def calculate_cost_drivers(
+        baseline_rows: List[List[list]],
+        target_rows: List[list],
+        category: str,
+        limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Rank the resource types behind a category's change against its baseline average
+        
+        ``share_of_change`` is a driver's part of the category's total increase,
+        so the shares of all rising resource types add up to 100.
+        """
+        
+        def totals_by_resource_type(rows: List[list]) -> Dict[str, float]:
+            totals = {}
+            for row in rows:
+                resource_type = row[2] if len(row) > 2 else ''
+                if category != 'Total' and CostProcessorService.categorize_resource_type(resource_type) != category:
+                    continue
+                totals[resource_type] = totals.get(resource_type, 0.0) + float(row[0])
+            return totals
+        
+        current = totals_by_resource_type(target_rows)
+        
+        average = {}
+        for day_rows in baseline_rows:
+            for resource_type, cost in totals_by_resource_type(day_rows).items():
+                average[resource_type] = average.get(resource_type, 0.0) + cost / len(baseline_rows)
+        
+        deltas = {
+            resource_type: current.get(resource_type, 0.0) - average.get(resource_type, 0.0)
+            for resource_type in set(current) | set(average)
+        }
+        total_increase = sum(delta for delta in deltas.values() if round(delta, 2) > 0)
+        
+        drivers = []
+        for resource_type, delta in sorted(deltas.items(), key=lambda item: item[1], reverse=True)[:limit]:
+            if round(delta, 2) <= 0:
+                break
+            
+            drivers.append({
+                'resource_type': resource_type,
+                'average_cost': round(average.get(resource_type, 0.0), 2),
+                'current_cost': round(current.get(resource_type, 0.0), 2),
+                'delta': round(delta, 2),
+                'share_of_change': round(delta / total_increase * 100, 2)
+            })
+        
+        return drivers
+    
     @staticmethod
     def calculate_percentage_change(previous: float, current: float) -> float:
         """Calculate percentage change between two values"""
@@ -5,15 +5,18 @@ from docx import Document
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from datetime import datetime, timedelta
-from typing import Dict, List
+from io import BytesIO
+from typing import Dict, List, Tuple
 import os
+import uuid
 
 
 class DocumentGeneratorService:
     """Generate Word documents for cost reports"""
     
-    def __init__(self, output_directory: str):
+    def __init__(self, output_directory: str, retention_count: int = 0):
         self.output_directory = output_directory
+        self.retention_count = retention_count
         os.makedirs(output_directory, exist_ok=True)
     
     def add_table_to_doc(self, doc: Document, table_data: List[list], headers: List[str], title: str = None):
@@ -45,8 +48,8 @@ class DocumentGeneratorService:
         
         doc.add_paragraph()  # Add spacing
     
-    def generate_cost_report(self, all_data: Dict, num_days: int) -> str:
-        """Generate a Word document with cost data"""
+    def build_cost_report(self, all_data: Dict, num_days: int) -> Document:
+        """Build a Word document with cost data"""
         
         doc = Document()
         
@@ -96,13 +99,64 @@ class DocumentGeneratorService:
         # Add closing
         doc.add_paragraph("\nThank you.")
         
-        # Save document
-        filename = f"Azure_Cost_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
-        filepath = os.path.join(self.output_directory, filename)
-        doc.save(filepath)
+        return doc
+    
+    def render_cost_report(self, all_data: Dict, num_days: int) -> Tuple[str, bytes]:
+        """Render a cost report into memory, returning its filename and content"""
+        
+        doc = self.build_cost_report(all_data, num_days)
+        
+        buffer = BytesIO()
+        doc.save(buffer)
+        
+        # The random part keeps concurrent reports apart and download names unguessable
+        filename = f"Azure_Cost_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}.docx"
+        return filename, buffer.getvalue()
+    
+    def generate_cost_report(self, all_data: Dict, num_days: int) -> str:
+        """Generate a Word document with cost data and save it to the output directory"""
+        
+        filename, content = self.render_cost_report(all_data, num_days)
+        self.save_report(filename, content)
         
         return filename
     
+    def save_report(self, filename: str, content: bytes):
+        """Save a rendered report, removing the oldest reports beyond the retention limit"""
+        
+        filepath = os.path.join(self.output_directory, filename)
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        
+        if self.retention_count <= 0:
+            return
+        
+        # Concurrent saves prune the same directory, so reports may vanish meanwhile
+        reports = []
+        for entry in os.scandir(self.output_directory):
+            if not entry.name.endswith('.docx'):
+                continue
+            try:
+                reports.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+        
+        for _, path in sorted(reports)[:-self.retention_count]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    
+    @staticmethod
+    def register_queries(query_planner, subscriptions: Dict[str, str], num_days: int):
+        """Register the cost data needed for a report with a query planner"""
+        
+        end_date = datetime.now() - timedelta(days=1)
+        start_date = end_date - timedelta(days=num_days - 1)
+        
+        for subscription_id in subscriptions.values():
+            query_planner.add(subscription_id, start_date, end_date)
+    
     def prepare_report_data(
         self,
         subscription_id: str,
@@ -0,0 +1,218 @@
+"""
+Cost Query Planning Service
+"""
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+from app.services.cost_data import CostDataService, DEFAULT_GROUPING
+from app.services.resilience import remaining_seconds
+
+
+# Cost Management accepts at most two group by clauses per query
+MAX_GROUPINGS = 2
+
+
+class QueryPlannerService:
+    """Merge the cost queries of all consumers into as few upstream calls as possible
+    
+    Consumers register their dimensions and date ranges with ``add``, and the
+    planner then stands in for ``CostDataService``, serving each consumer a
+    locally re-aggregated slice of the merged responses.
+    """
+    
+    def __init__(self, cost_data_service: CostDataService):
+        self.cost_data_service = cost_data_service
+        self._plans: Dict[str, List[Dict[str, Any]]] = {}
+    
+    @staticmethod
+    def _tag_count(dimensions: List[str]) -> int:
+        return sum(1 for dimension in dimensions if dimension.startswith('tag:'))
+    
+    @classmethod
+    def _can_merge(cls, plan_dimensions: List[str], dimensions: List[str]) -> bool:
+        """Check whether a dimension set fits into an existing plan"""
+        
+        merged = plan_dimensions + [d for d in dimensions if d not in plan_dimensions]
+        
+        # Tag groupings all come back as TagKey/TagValue columns, so only one per query
+        return len(merged) <= MAX_GROUPINGS and cls._tag_count(merged) <= 1
+    
+    def add(
+        self,
+        subscription_id: str,
+        start_date: datetime,
+        end_date: datetime,
+        dimensions: Optional[List[str]] = None
+    ):
+        """Register a consumer's data needs"""
+        
+        dimensions = list(dimensions or DEFAULT_GROUPING)
+        
+        if len(dimensions) > MAX_GROUPINGS or self._tag_count(dimensions) > 1:
+            raise ValueError(
+                f"A query can group by at most {MAX_GROUPINGS} dimensions and one tag"
+            )
+        
+        plans = self._plans.setdefault(subscription_id, [])
+        
+        for plan in plans:
+            if self._can_merge(plan['dimensions'], dimensions):
+                plan['dimensions'] += [d for d in dimensions if d not in plan['dimensions']]
+                plan['start_date'] = min(plan['start_date'], start_date)
+                plan['end_date'] = max(plan['end_date'], end_date)
+                plan['response'] = None
+                return
+        
+        plans.append({
+            'dimensions': dimensions,
+            'start_date': start_date,
+            'end_date': end_date,
+            'response': None
+        })
+    
+    def get_plan(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Get the merged queries that ``execute`` will issue"""
+        
+        return {
+            subscription_id: [
+                {
+                    'dimensions': list(plan['dimensions']),
+                    'start_date': plan['start_date'].strftime('%Y-%m-%d'),
+                    'end_date': plan['end_date'].strftime('%Y-%m-%d')
+                }
+                for plan in plans
+            ]
+            for subscription_id, plans in self._plans.items()
+        }
+    
+    def execute(self, delay_seconds: float = 0):
+        """Fetch every merged query that has not been fetched yet"""
+        
+        fetched = 0
+        for subscription_id, plans in self._plans.items():
+            for plan in plans:
+                if plan['response'] is None:
+                    # Add delay between queries to avoid rate limiting, leaving
+                    # at least half of the request's remaining time for the query
+                    if fetched and delay_seconds:
+                        delay = delay_seconds
+                        remaining = remaining_seconds(getattr(self.cost_data_service, 'deadline', None))
+                        if remaining is not None:
+                            delay = min(delay, max(remaining, 0) / 2)
+                        time.sleep(delay)
+                    fetched += 1
+                    plan['response'] = self.cost_data_service.get_cost_data_range(
+                        subscription_id,
+                        plan['start_date'],
+                        plan['end_date'],
+                        dimensions=plan['dimensions']
+                    ) or {}
+    
+    def _find_plan(
+        self,
+        subscription_id: str,
+        start_date: datetime,
+        end_date: datetime,
+        dimensions: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Find a plan covering the requested range and dimensions"""
+        
+        for plan in self._plans.get(subscription_id, []):
+            if (
+                plan['start_date'].date() <= start_date.date()
+                and plan['end_date'].date() >= end_date.date()
+                and all(d in plan['dimensions'] for d in dimensions)
+            ):
+                return plan
+        
+        return None
+    
+    @staticmethod
+    def _column_index(columns: List[Dict], name: str, default: int) -> int:
+        return next(
+            (i for i, col in enumerate(columns) if col['name'].lower() == name.lower()),
+            default
+        )
+    
+    def _reaggregate(
+        self,
+        plan: Dict[str, Any],
+        start_date: datetime,
+        end_date: datetime,
+        dimensions: List[str]
+    ) -> Dict[str, Any]:
+        """Sum a plan's rows down to the requested dimensions and date range"""
+        
+        response = plan['response']
+        columns = response.get('columns', [])
+        
+        date_idx = self._column_index(columns, 'UsageDate', 1)
+        currency_idx = self._column_index(columns, 'Currency', len(columns) - 1)
+        tag_key_idx = self._column_index(columns, 'TagKey', -1)
+        tag_value_idx = self._column_index(columns, 'TagValue', -1)
+        
+        value_getters = []
+        for dimension in dimensions:
+            if dimension.startswith('tag:'):
+                tag_key = dimension[len('tag:'):].lower()
+                value_getters.append(
+                    lambda row, key=tag_key: row[tag_value_idx]
+                    if str(row[tag_key_idx]).lower() == key else ''
+                )
+            else:
+                position = plan['dimensions'].index(dimension) + 2
+                idx = self._column_index(columns, dimension, position)
+                value_getters.append(lambda row, idx=idx: row[idx])
+        
+        start_key = int(start_date.strftime('%Y%m%d'))
+        end_key = int(end_date.strftime('%Y%m%d'))
+        
+        totals: Dict[Tuple, float] = {}
+        for row in response.get('rows', []):
+            date = row[date_idx]
+            if not start_key <= date <= end_key:
+                continue
+            
+            key = (date, *(get(row) for get in value_getters), row[currency_idx])
+            totals[key] = totals.get(key, 0.0) + float(row[0])
+        
+        slice_columns = [
+            {'name': 'Cost', 'type': 'Number'},
+            {'name': 'UsageDate', 'type': 'Number'}
+        ]
+        slice_columns += [{'name': dimension, 'type': 'String'} for dimension in dimensions]
+        slice_columns.append({'name': 'Currency', 'type': 'String'})
+        
+        return {
+            'columns': slice_columns,
+            'rows': [[cost, *key] for key, cost in totals.items()]
+        }
+    
+    def get_cost_data_range(
+        self,
+        subscription_id: str,
+        start_date: datetime,
+        end_date: datetime,
+        dimensions: Optional[List[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get a consumer's slice, querying upstream only if no plan covers it"""
+        
+        dimensions = list(dimensions or DEFAULT_GROUPING)
+        
+        plan = self._find_plan(subscription_id, start_date, end_date, dimensions)
+        if plan is None:
+            self.add(subscription_id, start_date, end_date, dimensions)
+            plan = self._find_plan(subscription_id, start_date, end_date, dimensions)
+        
+        if plan['response'] is None:
+            self.execute()
+        
+        if not plan['response']:
+            return None
+        
+        return self._reaggregate(plan, start_date, end_date, dimensions)
+    
+    def parse_range_response(self, response_data: Dict[str, Any]) -> Dict[int, list]:
+        """Parse a slice and organize by date"""
+        
+        return self.cost_data_service.parse_range_response(response_data)
@@ -0,0 +1,55 @@
+"""
+In-Memory Report Store
+"""
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+from app.config import get_settings
+
+
+class ReportStore:
+    """Hold rendered reports in memory for a one-time download
+    
+    Least recently added reports are evicted once the store exceeds its
+    report count or total size limit.
+    """
+    
+    def __init__(self, max_reports: int, max_bytes: int):
+        self.max_reports = max_reports
+        self.max_bytes = max_bytes
+        self._reports: OrderedDict = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+    
+    def put(self, filename: str, content: bytes):
+        """Store a report, evicting the oldest ones beyond the limits"""
+        
+        with self._lock:
+            if filename in self._reports:
+                self._total_bytes -= len(self._reports.pop(filename))
+            
+            self._reports[filename] = content
+            self._total_bytes += len(content)
+            
+            while self._reports and (
+                len(self._reports) > self.max_reports or self._total_bytes > self.max_bytes
+            ):
+                _, evicted = self._reports.popitem(last=False)
+                self._total_bytes -= len(evicted)
+    
+    def pop(self, filename: str) -> Optional[bytes]:
+        """Take a report out of the store, so it can only be downloaded once"""
+        
+        with self._lock:
+            content = self._reports.pop(filename, None)
+            if content is not None:
+                self._total_bytes -= len(content)
+            return content
+
+
+@lru_cache()
+def get_report_store() -> ReportStore:
+    """Get the shared report store instance"""
+    settings = get_settings()
+    return ReportStore(settings.report_store_max_reports, settings.report_store_max_bytes)
@@ -0,0 +1,255 @@
+"""
+Upstream Resilience Service
+"""
+import threading
+import time
+import requests
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, as_completed
+from functools import lru_cache
+from typing import Dict, Optional, Any, Hashable
+from app.config import get_settings
+
+
+class CircuitOpenError(Exception):
+    """Raised when an endpoint's circuit breaker rejects a call"""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request's deadline leaves no time for an upstream call"""
+
+
+class RateLimitedError(Exception):
+    """Raised when upstream keeps throttling a call after all retries"""
+
+
+def remaining_seconds(deadline: Optional[float]) -> Optional[float]:
+    """Get the time left until a time.monotonic() deadline"""
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures, probing again after a cool-down"""
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Check whether a call may go through, letting one probe through once half-open"""
+        
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = 'half_open'
+                return True
+            
+            return self.state == 'closed'
+    
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+    
+    def record_abandoned(self):
+        """Note a call that ended without telling anything about upstream health"""
+        
+        with self._lock:
+            # The cool-down has already passed, so the next call probes again
+            if self.state == 'half_open':
+                self.state = 'open'
+
+
+class LatencyTracker:
+    """Keep recent successful call latencies to derive hedging delays"""
+    
+    def __init__(self, window: int = 200):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+    
+    def percentile(self, percent: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        
+        position = min(int(len(ordered) * percent / 100), len(ordered) - 1)
+        return ordered[position]
+
+
+class ResponseCache:
+    """Remember recent successful responses to serve while upstream is degraded"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+    
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class UpstreamClient:
+    """Send upstream requests through per-endpoint circuit breakers, with optional hedging
+    
+    A hedged call sends a duplicate request once the primary has been
+    outstanding longer than the endpoint's recent latency percentile and
+    takes whichever response arrives first.
+    """
+    
+    def __init__(
+        self,
+        default_timeout: float = 30,
+        breaker_failure_threshold: int = 5,
+        breaker_reset_seconds: float = 30,
+        hedge_enabled: bool = False,
+        hedge_percentile: float = 95,
+        hedge_min_samples: int = 20
+    ):
+        self.default_timeout = default_timeout
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='upstream')
+    
+    def _get_breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(
+                    self.breaker_failure_threshold, self.breaker_reset_seconds
+                )
+                self._latencies[endpoint] = LatencyTracker()
+            return self._breakers[endpoint]
+    
+    def get_status(self) -> Dict[str, str]:
+        """Get the circuit breaker state of every endpoint seen so far"""
+        with self._lock:
+            return {endpoint: breaker.state for endpoint, breaker in self._breakers.items()}
+    
+    def _hedged_post(self, endpoint: str, url: str, timeout: float, **kwargs) -> requests.Response:
+        hedge_after = None
+        if self.hedge_enabled:
+            hedge_after = self._latencies[endpoint].percentile(self.hedge_percentile, self.hedge_min_samples)
+        
+        if hedge_after is None or hedge_after >= timeout:
+            return requests.post(url, timeout=timeout, **kwargs)
+        
+        started = time.monotonic()
+        primary = self._executor.submit(requests.post, url, timeout=timeout, **kwargs)
+        
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        
+        hedge = self._executor.submit(
+            requests.post, url, timeout=timeout - (time.monotonic() - started), **kwargs
+        )
+        
+        # The slower request keeps running in the background until its own timeout,
+        # and neither may wait in the executor queue beyond the call's timeout
+        error = None
+        try:
+            for future in as_completed([primary, hedge], timeout=timeout - (time.monotonic() - started)):
+                try:
+                    return future.result()
+                except requests.exceptions.RequestException as e:
+                    error = e
+        except FutureTimeoutError:
+            primary.cancel()
+            hedge.cancel()
+            raise requests.exceptions.Timeout(f"No response from {endpoint} within {timeout:.1f}s")
+        
+        raise error
+    
+    def post(self, endpoint: str, url: str, deadline: Optional[float] = None, **kwargs) -> requests.Response:
+        """POST to an upstream endpoint within the caller's deadline"""
+        
+        timeout = self.default_timeout
+        remaining = remaining_seconds(deadline)
+        if remaining is not None:
+            if remaining <= 0:
+                raise DeadlineExceededError("Request deadline exceeded before calling upstream")
+            timeout = min(timeout, remaining)
+        
+        # A timeout set by the caller's deadline says nothing about upstream health
+        deadline_bound = timeout < self.default_timeout
+        
+        breaker = self._get_breaker(endpoint)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {endpoint}, upstream is degraded")
+        
+        started = time.monotonic()
+        try:
+            response = self._hedged_post(endpoint, url, timeout, **kwargs)
+        except requests.exceptions.Timeout as e:
+            if deadline_bound:
+                breaker.record_abandoned()
+                raise DeadlineExceededError(f"Request deadline exceeded waiting for {endpoint}") from e
+            breaker.record_failure()
+            raise
+        except requests.exceptions.RequestException:
+            breaker.record_failure()
+            raise
+        
+        # Throttling is handled by the caller's retries and does not open the circuit
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+            if response.status_code < 400:
+                self._latencies[endpoint].record(time.monotonic() - started)
+        
+        return response
+
+
+@lru_cache()
+def get_upstream_client() -> UpstreamClient:
+    """Get the shared upstream client instance"""
+    settings = get_settings()
+    return UpstreamClient(
+        default_timeout=settings.upstream_timeout_seconds,
+        breaker_failure_threshold=settings.upstream_breaker_failure_threshold,
+        breaker_reset_seconds=settings.upstream_breaker_reset_seconds,
+        hedge_enabled=settings.upstream_hedge_enabled,
+        hedge_percentile=settings.upstream_hedge_percentile,
+        hedge_min_samples=settings.upstream_hedge_min_samples
+    )
+
+
+@lru_cache()
+def get_response_cache() -> ResponseCache:
+    """Get the shared fallback response cache"""
+    return ResponseCache(get_settings().upstream_fallback_cache_size)
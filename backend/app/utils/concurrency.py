@@ -0,0 +1,18 @@
+"""
+Blocking Work Offloading
+"""
+from starlette.concurrency import run_in_threadpool
+from app.utils.profiling import active_profiler
+
+
+async def run_blocking(func, *args):
+    """Run blocking service work in the threadpool, keeping the event loop free
+    
+    When the request is being profiled the work runs under its profiler.
+    """
+    
+    profiler = active_profiler.get()
+    if profiler is None:
+        return await run_in_threadpool(func, *args)
+    
+    return await run_in_threadpool(profiler.run, func, *args)
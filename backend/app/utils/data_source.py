@@ -0,0 +1,35 @@
+"""
+Cost Data Source Selection
+"""
+import time
+from typing import Optional
+from app.config import Settings
+from app.services.azure_auth import AzureAuthService
+from app.services.cost_data import CostDataService
+from app.services.cost_export import CostExportService
+
+
+def get_deadline(settings: Settings, request_timeout: Optional[float] = None) -> Optional[float]:
+    """Get the upstream deadline for a request, from its own timeout or the configured default"""
+    
+    timeout = request_timeout if request_timeout is not None else settings.upstream_deadline_seconds
+    if not timeout:
+        return None
+    
+    return time.monotonic() + timeout
+
+
+def create_cost_data_service(
+    settings: Settings,
+    auth_service: AzureAuthService,
+    deadline: Optional[float] = None
+):
+    """Create the configured cost data source"""
+    
+    if settings.cost_data_source == 'export':
+        return CostExportService(settings.cost_export_directory)
+    
+    if settings.cost_data_source != 'api':
+        raise ValueError(f"Unknown cost data source: {settings.cost_data_source}")
+    
+    return CostDataService(auth_service.get_access_token(deadline), deadline)
@@ -0,0 +1,194 @@
+"""
+On-Demand Request Profiling
+"""
+import cProfile
+import contextvars
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from urllib.parse import parse_qs
+
+
+PROFILE_MODES = ('pstats', 'flamegraph')
+
+# Profiler of the current request, picked up by work offloaded to worker threads
+active_profiler: contextvars.ContextVar = contextvars.ContextVar('active_profiler', default=None)
+
+
+class DeterministicProfiler:
+    """Profile the calls a request runs in worker threads with cProfile"""
+    
+    def __init__(self):
+        self.profile = cProfile.Profile()
+    
+    def run(self, func, *args):
+        return self.profile.runcall(func, *args)
+    
+    def dump(self, path: str):
+        self.profile.dump_stats(path)
+
+
+class SamplingProfiler:
+    """Sample the call stacks of a request's worker threads into folded stacks for flamegraph tools
+    
+    Only threads running a call through ``run`` are sampled; the event loop
+    thread mostly waits or serves other requests while a handler's work is
+    offloaded.
+    """
+    
+    def __init__(self, interval_seconds: float = 0.005):
+        self.thread_ids = set()
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                
+                if stack:
+                    self.stacks[';'.join(reversed(stack))] += 1
+    
+    def run(self, func, *args):
+        """Run a call in the current thread, sampling it as part of the request"""
+        
+        thread_id = threading.get_ident()
+        self.thread_ids.add(thread_id)
+        try:
+            return func(*args)
+        finally:
+            self.thread_ids.discard(thread_id)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def dump(self, path: str):
+        """Write folded stacks, one 'frame;frame;frame count' line per stack"""
+        
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """Profile individual requests on demand
+    
+    A request is profiled when it sets the ``X-Profile`` header or ``profile``
+    query parameter to ``pstats`` or ``flamegraph`` and carries the admin token
+    in ``X-Admin-Token``. The artifact is written to the profile directory and
+    named in the ``X-Profile-Artifact`` response header.
+    
+    Both modes cover the work a handler offloads with ``run_blocking``. Only
+    the newest ``retention_count`` artifacts are kept.
+    """
+    
+    def __init__(self, app, admin_token: str, profile_directory: str, retention_count: int = 0):
+        self.app = app
+        self.admin_token = admin_token
+        self.profile_directory = profile_directory
+        self.retention_count = retention_count
+        os.makedirs(profile_directory, exist_ok=True)
+        
+        # Only one deterministic profiler can be active per process
+        self._pstats_lock = threading.Lock()
+    
+    def _prune_artifacts(self):
+        """Remove the oldest artifacts beyond the retention limit"""
+        
+        if self.retention_count <= 0:
+            return
+        
+        # Concurrently profiled requests prune the same directory
+        artifacts = []
+        for entry in os.scandir(self.profile_directory):
+            if not entry.name.endswith(('.prof', '.folded')):
+                continue
+            try:
+                artifacts.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+        
+        for _, path in sorted(artifacts)[:-self.retention_count]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    
+    def _requested_mode(self, scope) -> Optional[str]:
+        headers = dict(scope.get('headers') or [])
+        
+        mode = headers.get(b'x-profile', b'').decode()
+        if not mode and scope.get('query_string'):
+            mode = parse_qs(scope['query_string'].decode()).get('profile', [''])[0]
+        
+        if mode not in PROFILE_MODES:
+            return None
+        
+        token = headers.get(b'x-admin-token', b'').decode()
+        if not hmac.compare_digest(token, self.admin_token):
+            return None
+        
+        return mode
+    
+    async def __call__(self, scope, receive, send):
+        mode = self._requested_mode(scope) if scope['type'] == 'http' else None
+        if mode == 'pstats' and not self._pstats_lock.acquire(blocking=False):
+            mode = None
+        
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        
+        path_name = scope['path'].strip('/').replace('/', '_') or 'root'
+        extension = 'prof' if mode == 'pstats' else 'folded'
+        filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{path_name}.{extension}"
+        
+        async def send_with_artifact(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [
+                    (b'x-profile-artifact', filename.encode())
+                ]
+            await send(message)
+        
+        if mode == 'pstats':
+            profiler = DeterministicProfiler()
+        else:
+            profiler = SamplingProfiler()
+            profiler.start()
+        
+        token = active_profiler.set(profiler)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_artifact)
+        finally:
+            elapsed = time.perf_counter() - started
+            active_profiler.reset(token)
+            path = os.path.join(self.profile_directory, filename)
+            
+            if mode == 'pstats':
+                self._pstats_lock.release()
+            else:
+                profiler.stop()
+            profiler.dump(path)
+            self._prune_artifacts()
+            
+            print(f"Profiled {scope['path']} in {elapsed:.3f}s: {path}")
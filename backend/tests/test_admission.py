@@ -0,0 +1,43 @@
+"""
+Tests for request admission control
+"""
+import asyncio
+import pytest
+from app.services.admission import AdmissionController, AdmissionRejectedError, estimate_request_cost
+
+
+def test_reports_always_weigh_more_than_detect():
+    detect = estimate_request_cost('detect', 1, 1000)
+    
+    for days in (1, 7, 30, 90):
+        assert estimate_request_cost('generate', days, 1000)['weight'] > detect['weight']
+    assert detect['weight'] == 1
+
+
+def test_detect_is_admitted_while_other_requests_fill_their_share():
+    async def scenario():
+        controller = AdmissionController(
+            capacity=16, heavy_capacity=12, heavy_weight=2, max_queue=0,
+            queue_timeout_seconds=1, retry_after_seconds=1, reserved_capacity=4
+        )
+        release = asyncio.Event()
+        
+        async def hold(weight):
+            async with controller.admit(weight):
+                await release.wait()
+        
+        # Light history requests take every slot outside the reserve
+        holders = [asyncio.create_task(hold(1)) for _ in range(12)]
+        await asyncio.sleep(0)
+        
+        with pytest.raises(AdmissionRejectedError):
+            async with controller.admit(1):
+                pass
+        
+        async with controller.admit(1, reserved=True):
+            assert controller.get_status()['in_use'] == 13
+        
+        release.set()
+        await asyncio.gather(*holders)
+    
+    asyncio.run(scenario())
@@ -0,0 +1,119 @@
+"""
+Tests for incremental anomaly alerting
+"""
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+from app.services.anomaly_alerts import AnomalyAlertService
+from app.services.cost_data import CostDataService
+from app.services.cost_processor import CostProcessorService
+from app.services.query_planner import QueryPlannerService
+
+
+SUBSCRIPTIONS = {'prod': 'sub-prod', 'dev': 'sub-dev', 'test': 'sub-test', 'main': 'sub-main'}
+
+
+class FakeCostDataService:
+    """Serve one VM cost row per day that has a cost set"""
+    
+    parse_range_response = CostDataService.parse_range_response
+    
+    def __init__(self, daily_costs):
+        self.daily_costs = daily_costs
+    
+    def get_cost_data_range(self, subscription_id, start_date, end_date, dimensions=None):
+        rows = []
+        date = start_date
+        while date.date() <= end_date.date():
+            date_key = int(date.strftime('%Y%m%d'))
+            if date_key in self.daily_costs:
+                rows.append([self.daily_costs[date_key], date_key, 'microsoft.compute/virtualmachines', 'USD'])
+            date += timedelta(days=1)
+        
+        return {
+            'columns': [
+                {'name': 'Cost'}, {'name': 'UsageDate'}, {'name': 'ResourceType'}, {'name': 'Currency'}
+            ],
+            'rows': rows
+        }
+
+
+@pytest.fixture
+def webhook():
+    """Run a local HTTP receiver that records posted alerts"""
+    
+    received = []
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            received.append(json.loads(body))
+            self.send_response(204)
+            self.end_headers()
+        
+        def log_message(self, *args):
+            pass
+    
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    
+    yield f"http://127.0.0.1:{server.server_port}/alerts", received
+    
+    server.shutdown()
+    server.server_close()
+
+
+def evaluate(daily_costs, state_path, url, today):
+    alert_service = AnomalyAlertService(
+        QueryPlannerService(FakeCostDataService(daily_costs)),
+        CostProcessorService(),
+        str(state_path),
+        [url],
+        restatement_days=3
+    )
+    return alert_service.evaluate(SUBSCRIPTIONS, 25.0, today=today)
+
+
+def pushed(received):
+    return sorted((alert['subscription'], alert['target_date'], alert['has_anomalies']) for alert in received)
+
+
+def test_pushes_only_state_changes(tmp_path, webhook):
+    url, received = webhook
+    state_path = tmp_path / 'alert_state.json'
+    
+    daily_costs = {int(f"202410{day:02d}"): 10.0 for day in range(1, 12)}
+    daily_costs[20241010] = 100.0
+    
+    # The first run checks yesterday only and flags the spike
+    evaluate(daily_costs, state_path, url, datetime(2024, 10, 11))
+    assert pushed(received) == [(name, '2024-10-10', True) for name in sorted(SUBSCRIPTIONS)]
+    
+    # The next run reaches back to 10-09 for the first time, which has no
+    # earlier state to change from, while the new day 10-11 clears the alert
+    received.clear()
+    result = evaluate(daily_costs, state_path, url, datetime(2024, 10, 12))
+    assert pushed(received) == [(name, '2024-10-11', False) for name in sorted(SUBSCRIPTIONS)]
+    assert result['alerts_sent'] == 4
+    
+    # Nothing new has landed, so nothing is pushed
+    received.clear()
+    evaluate(daily_costs, state_path, url, datetime(2024, 10, 12))
+    assert received == []
+
+
+def test_pushes_restated_days(tmp_path, webhook):
+    url, received = webhook
+    state_path = tmp_path / 'alert_state.json'
+    
+    daily_costs = {int(f"202410{day:02d}"): 10.0 for day in range(1, 12)}
+    evaluate(daily_costs, state_path, url, datetime(2024, 10, 12))
+    assert received == []
+    
+    # Restated data for a day in the window is re-checked and its change pushed
+    daily_costs[20241011] = 100.0
+    evaluate(daily_costs, state_path, url, datetime(2024, 10, 12))
+    assert pushed(received) == [(name, '2024-10-11', True) for name in sorted(SUBSCRIPTIONS)]
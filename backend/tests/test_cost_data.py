@@ -0,0 +1,139 @@
+"""
+Tests for the Azure cost data service
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.services.cost_data import CostDataService
+from app.services.resilience import ResponseCache, UpstreamClient, DeadlineExceededError
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+    
+    def json(self):
+        return self.body
+    
+    def raise_for_status(self):
+        pass
+
+
+class FakeUpstreamClient:
+    """Serve queued responses and record the URLs posted to"""
+    
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.urls = []
+    
+    def post(self, endpoint, url, deadline=None, **kwargs):
+        self.urls.append(url)
+        return self.responses.pop(0)
+
+
+COLUMNS = [{'name': 'Cost'}, {'name': 'UsageDate'}, {'name': 'ResourceType'}, {'name': 'Currency'}]
+
+
+def test_get_cost_data_range_follows_next_links():
+    upstream = FakeUpstreamClient([
+        FakeResponse(200, {'properties': {
+            'columns': COLUMNS,
+            'rows': [[1.0, 20241001, 'vm', 'USD']],
+            'nextLink': 'https://example.test/page2'
+        }}),
+        FakeResponse(200, {'properties': {
+            'columns': COLUMNS,
+            'rows': [[2.0, 20241002, 'vm', 'USD']],
+            'nextLink': 'https://example.test/page3'
+        }}),
+        FakeResponse(200, {'properties': {
+            'columns': COLUMNS,
+            'rows': [[4.0, 20241003, 'vm', 'USD']],
+            'nextLink': None
+        }})
+    ])
+    service = CostDataService('token', upstream_client=upstream, response_cache=ResponseCache(8))
+    
+    result = service.get_cost_data_range('sub', datetime(2024, 10, 1), datetime(2024, 10, 3))
+    
+    assert [row[0] for row in result['rows']] == [1.0, 2.0, 4.0]
+    assert 'nextLink' not in result
+    assert upstream.urls[1:] == ['https://example.test/page2', 'https://example.test/page3']
+
+
+def test_get_cost_data_range_serves_cache_while_throttled(monkeypatch):
+    monkeypatch.setattr('app.services.cost_data.time.sleep', lambda seconds: None)
+    
+    cache = ResponseCache(8)
+    fresh = FakeUpstreamClient([
+        FakeResponse(200, {'properties': {'columns': COLUMNS, 'rows': [[1.0, 20241001, 'vm', 'USD']]}})
+    ])
+    CostDataService('token', upstream_client=fresh, response_cache=cache).get_cost_data_range(
+        'sub', datetime(2024, 10, 1), datetime(2024, 10, 1)
+    )
+    
+    throttled = FakeUpstreamClient([FakeResponse(429, headers={'Retry-After': '1'}) for _ in range(4)])
+    result = CostDataService('token', upstream_client=throttled, response_cache=cache).get_cost_data_range(
+        'sub', datetime(2024, 10, 1), datetime(2024, 10, 1)
+    )
+    
+    assert result['rows'] == [[1.0, 20241001, 'vm', 'USD']]
+    assert len(throttled.urls) == 4
+
+
+@pytest.fixture
+def slow_server():
+    """Run a local HTTP server that answers every POST after half a second"""
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(0.5)
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'{}')
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    yield f"http://127.0.0.1:{server.server_port}/query"
+    
+    server.shutdown()
+    server.server_close()
+
+
+def test_short_deadlines_do_not_open_the_circuit(slow_server):
+    upstream = UpstreamClient(default_timeout=5, breaker_failure_threshold=5)
+    
+    for _ in range(5):
+        with pytest.raises(DeadlineExceededError):
+            upstream.post('sub/query', slow_server, deadline=time.monotonic() + 0.1, json={})
+    
+    assert upstream.get_status() == {'sub/query': 'closed'}
+    assert upstream.post('sub/query', slow_server, json={}).status_code == 200
+
+
+def test_hedged_calls_do_not_wait_past_their_deadline(slow_server):
+    upstream = UpstreamClient(default_timeout=5, hedge_enabled=True, hedge_min_samples=1)
+    upstream._get_breaker('sub/query')
+    upstream._latencies['sub/query'].record(0.01)
+    
+    # Leftover requests occupy every executor worker
+    upstream._executor = ThreadPoolExecutor(max_workers=1)
+    upstream._executor.submit(time.sleep, 2)
+    
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        upstream.post('sub/query', slow_server, deadline=time.monotonic() + 0.3, json={})
+    
+    assert time.monotonic() - started < 1
+    assert upstream.get_status() == {'sub/query': 'closed'}
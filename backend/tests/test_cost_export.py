@@ -0,0 +1,71 @@
+"""
+Tests for the cost export file service
+"""
+import os
+from datetime import datetime
+from app.services.cost_export import CostExportService
+
+
+HEADER = "Date,SubscriptionId,ResourceType,CostInBillingCurrency,BillingCurrencyCode\n"
+
+
+def write_export(path, rows, mtime):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(HEADER)
+        for row in rows:
+            f.write(','.join(str(value) for value in row) + '\n')
+    os.utime(path, (mtime, mtime))
+
+
+def test_partitioned_export_reads_all_files_of_the_newest_run(tmp_path):
+    period = tmp_path / 'daily' / '20241001-20241031'
+    
+    # The month-to-date export ran twice, the later run restating 10-01
+    write_export(period / 'run-1' / 'part_0.csv', [('2024-10-01', 'sub', 'vm', 5, 'USD')], 1000)
+    write_export(period / 'run-2' / 'part_0.csv', [('2024-10-01', 'sub', 'vm', 7, 'USD')], 2000)
+    write_export(period / 'run-2' / 'part_1.csv', [('2024-10-02', 'sub', 'disk', 3, 'USD')], 2000)
+    
+    service = CostExportService(str(tmp_path))
+    selected = service.select_files(datetime(2024, 10, 1), datetime(2024, 10, 2))
+    
+    assert sorted(selected) == [
+        os.path.join('daily', '20241001-20241031', 'run-2', 'part_0.csv'),
+        os.path.join('daily', '20241001-20241031', 'run-2', 'part_1.csv')
+    ]
+    
+    result = service.get_cost_data_range('sub', datetime(2024, 10, 1), datetime(2024, 10, 2))
+    assert sorted(result['rows']) == [
+        [3.0, 20241002, 'disk', 'USD'],
+        [7.0, 20241001, 'vm', 'USD']
+    ]
+
+
+def test_legacy_export_reads_the_newest_file_of_a_period(tmp_path):
+    period = tmp_path / 'daily' / '20241001-20241031'
+    
+    write_export(period / 'daily_a.csv', [('2024-10-01', 'sub', 'vm', 5, 'USD')], 1000)
+    write_export(period / 'daily_b.csv', [('2024-10-01', 'sub', 'vm', 7, 'USD')], 2000)
+    
+    # Files outside a period folder are indexed by the dates they contain
+    write_export(tmp_path / 'adhoc' / 'export.csv', [('2024-10-01', 'sub', 'storage', 2, 'USD')], 1500)
+    
+    service = CostExportService(str(tmp_path))
+    result = service.get_cost_data_range('sub', datetime(2024, 10, 1), datetime(2024, 10, 1))
+    
+    assert sorted(result['rows']) == [
+        [2.0, 20241001, 'storage', 'USD'],
+        [7.0, 20241001, 'vm', 'USD']
+    ]
+    
+    # Rows of other subscriptions are left out
+    assert service.get_cost_data_range('other', datetime(2024, 10, 1), datetime(2024, 10, 1))['rows'] == []
+
+
+def test_truncated_rows_are_skipped(tmp_path):
+    path = tmp_path / 'daily' / '20241001-20241031' / 'daily.csv'
+    write_export(path, [('2024-10-01', 'sub', 'vm', 5, 'USD'), ('2024-10-01', 'sub', 'vm', 4)], 1000)
+    
+    result = CostExportService(str(tmp_path)).get_cost_data_range('sub', datetime(2024, 10, 1), datetime(2024, 10, 1))
+    
+    assert result['rows'] == [[5.0, 20241001, 'vm', 'USD']]
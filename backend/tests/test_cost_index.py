@@ -0,0 +1,153 @@
+"""
+Tests for the cost range index
+"""
+import random
+import threading
+from datetime import date, datetime, timedelta
+import pytest
+from app.services.cost_data import CostDataService
+from app.services.cost_index import CostIndexService, CATEGORIES, week_key, month_key
+from app.services.cost_processor import CostProcessorService
+
+
+class FakeCostDataService:
+    """Serve one VM cost row per day that has a cost set"""
+    
+    parse_range_response = CostDataService.parse_range_response
+    
+    def __init__(self, daily_costs):
+        self.daily_costs = daily_costs
+    
+    def get_cost_data_range(self, subscription_id, start_date, end_date, dimensions=None):
+        rows = []
+        date_ = start_date
+        while date_.date() <= end_date.date():
+            date_key = int(date_.strftime('%Y%m%d'))
+            if date_key in self.daily_costs:
+                rows.append([self.daily_costs[date_key], date_key, 'microsoft.compute/virtualmachines', 'USD'])
+            date_ += timedelta(days=1)
+        
+        return {
+            'columns': [
+                {'name': 'Cost'}, {'name': 'UsageDate'}, {'name': 'ResourceType'}, {'name': 'Currency'}
+            ],
+            'rows': rows
+        }
+
+
+def day_costs(cost):
+    return {'Virtual Machine': cost, 'Total': cost}
+
+
+def test_updates_match_brute_force_sums():
+    rng = random.Random(7)
+    cost_index = CostIndexService(CostProcessorService())
+    expected = {}
+    
+    # New days, restated days and days before the current base, in random order
+    for _ in range(60):
+        days = {
+            date(2024, 6, 1) + timedelta(days=rng.randrange(120)): {
+                category: round(rng.uniform(0, 100), 2) for category in CATEGORIES
+            }
+            for _ in range(rng.randrange(1, 6))
+        }
+        cost_index.update('prod', days)
+        expected.update(days)
+    
+    first, last = min(expected), max(expected)
+    assert cost_index.first_day('prod') == first
+    assert cost_index.last_day('prod') == last
+    
+    for _ in range(200):
+        start = first + timedelta(days=rng.randrange((last - first).days + 1))
+        end = start + timedelta(days=rng.randrange((last - start).days + 1))
+        category = rng.choice(CATEGORIES)
+        
+        brute_force = sum(costs[category] for day, costs in expected.items() if start <= day <= end)
+        assert cost_index.range_total('prod', category, start, end) == pytest.approx(brute_force)
+    
+    for period, key in (('week', week_key), ('month', month_key)):
+        for category in CATEGORIES:
+            brute_force = {}
+            for day, costs in expected.items():
+                brute_force[key(day)] = brute_force.get(key(day), 0.0) + costs[category]
+            
+            rollup = cost_index.rollups('prod', category, period)
+            assert rollup.keys() == brute_force.keys()
+            for period_key, total in brute_force.items():
+                assert rollup[period_key] == pytest.approx(total)
+
+
+def test_range_total_rejects_days_outside_the_index():
+    cost_index = CostIndexService(CostProcessorService())
+    cost_index.update('prod', {date(2024, 10, 5) + timedelta(days=i): day_costs(10.0) for i in range(5)})
+    
+    assert cost_index.range_total('prod', 'Total', date(2024, 10, 5), date(2024, 10, 9)) == 50.0
+    
+    with pytest.raises(ValueError, match="only indexed from 2024-10-05 to 2024-10-09"):
+        cost_index.range_total('prod', 'Total', date(2024, 10, 1), date(2024, 10, 9))
+    with pytest.raises(ValueError):
+        cost_index.range_total('prod', 'Total', date(2024, 10, 5), date(2024, 10, 10))
+    
+    # The index starts mid-month, so month-to-date would be too low
+    with pytest.raises(ValueError, match="Month-to-date"):
+        cost_index.budget_status('prod', 'Total', 1000.0)
+
+
+def test_budget_status_projects_month_to_date():
+    cost_index = CostIndexService(CostProcessorService())
+    cost_index.update('prod', {date(2024, 9, 28) + timedelta(days=i): day_costs(10.0) for i in range(13)})
+    
+    status = cost_index.budget_status('prod', 'Total', 500.0)
+    
+    assert status['through_date'] == '2024-10-10'
+    assert status['month_to_date'] == 100.0
+    assert status['projected'] == 310.0
+    assert status['over_budget'] is False
+
+
+def test_refresh_restates_days_in_the_window():
+    daily_costs = {int(f"202410{day:02d}"): 10.0 for day in range(1, 11)}
+    fake = FakeCostDataService(daily_costs)
+    cost_index = CostIndexService(CostProcessorService())
+    
+    cost_index.refresh(fake, {'prod': 'sub-prod'}, 10, 3, today=datetime(2024, 10, 11))
+    assert cost_index.range_total('prod', 'Total', date(2024, 10, 1), date(2024, 10, 10)) == 100.0
+    
+    # 10-08 is restated and 10-09 loses its rows, while 10-11 lands
+    daily_costs[20241008] = 25.0
+    del daily_costs[20241009]
+    daily_costs[20241011] = 10.0
+    cost_index.refresh(fake, {'prod': 'sub-prod'}, 10, 3, today=datetime(2024, 10, 12))
+    
+    assert cost_index.last_day('prod') == date(2024, 10, 11)
+    assert cost_index.range_total('prod', 'Total', date(2024, 10, 8), date(2024, 10, 9)) == 25.0
+    assert cost_index.range_total('prod', 'Total', date(2024, 10, 1), date(2024, 10, 11)) == 115.0
+    assert cost_index.rollups('prod', 'Total', 'month') == {'2024-10': pytest.approx(115.0)}
+
+
+def test_concurrent_stale_requests_refresh_once():
+    class CountingService(FakeCostDataService):
+        calls = 0
+        
+        def get_cost_data_range(self, *args, **kwargs):
+            CountingService.calls += 1
+            return super().get_cost_data_range(*args, **kwargs)
+    
+    cost_index = CostIndexService(CostProcessorService())
+    service = CountingService({})
+    
+    threads = [
+        threading.Thread(
+            target=cost_index.refresh_if_stale,
+            args=('prod', 3600, service, {'prod': 'sub-prod'}, 10, 3)
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert CountingService.calls == 1
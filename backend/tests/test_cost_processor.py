@@ -0,0 +1,67 @@
+"""
+Tests for cost processing
+"""
+import pytest
+from app.services.cost_processor import CostProcessorService
+
+
+VM = 'microsoft.compute/virtualmachines'
+DISK = 'microsoft.compute/disks'
+STORAGE = 'microsoft.storage/storageaccounts'
+
+
+def baseline(*days):
+    """Build seven baseline days, each a list of rows"""
+    return [[[cost, 20241001 + i, resource_type, 'USD'] for resource_type, cost in day] for i, day in enumerate(days)]
+
+
+def test_drivers_compare_against_the_seven_day_average():
+    baseline_rows = baseline(*([[(VM, 10.0)]] * 6 + [[(VM, 24.0)]]))
+    target_rows = [[30.0, 20241008, VM, 'USD']]
+    
+    drivers = CostProcessorService.calculate_cost_drivers(baseline_rows, target_rows, 'Virtual Machine')
+    
+    assert drivers == [{
+        'resource_type': VM,
+        'average_cost': 12.0,
+        'current_cost': 30.0,
+        'delta': 18.0,
+        'share_of_change': 100.0
+    }]
+
+
+def test_drivers_only_include_the_category():
+    baseline_rows = baseline(*([[(VM, 10.0), (STORAGE, 10.0)]] * 7))
+    target_rows = [[20.0, 20241008, VM, 'USD'], [50.0, 20241008, STORAGE, 'USD']]
+    
+    vm_drivers = CostProcessorService.calculate_cost_drivers(baseline_rows, target_rows, 'Virtual Machine')
+    assert [driver['resource_type'] for driver in vm_drivers] == [VM]
+    
+    total_drivers = CostProcessorService.calculate_cost_drivers(baseline_rows, target_rows, 'Total')
+    assert [driver['resource_type'] for driver in total_drivers] == [STORAGE, VM]
+
+
+def test_drivers_leave_out_falling_and_unchanged_resource_types():
+    baseline_rows = baseline(*([[('a', 10.0), ('b', 10.0), ('c', 10.0), ('d', 10.0)]] * 7))
+    target_rows = [
+        [40.0, 20241008, 'a', 'USD'],
+        [20.0, 20241008, 'b', 'USD'],
+        [10.004, 20241008, 'c', 'USD']
+    ]
+    
+    drivers = CostProcessorService.calculate_cost_drivers(baseline_rows, target_rows, 'Others')
+    
+    # 'c' rose by less than a cent and 'd' fell to zero
+    assert [driver['resource_type'] for driver in drivers] == ['a', 'b']
+    
+    # Shares split the total increase even though 'd' fell
+    assert [driver['share_of_change'] for driver in drivers] == pytest.approx([75.0, 25.0], abs=0.01)
+
+
+def test_drivers_are_limited():
+    baseline_rows = baseline(*([[]] * 7))
+    target_rows = [[float(i + 1), 20241008, f"type-{i}", 'USD'] for i in range(8)]
+    
+    drivers = CostProcessorService.calculate_cost_drivers(baseline_rows, target_rows, 'Others', limit=3)
+    
+    assert [driver['resource_type'] for driver in drivers] == ['type-7', 'type-6', 'type-5']
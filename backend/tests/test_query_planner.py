@@ -0,0 +1,127 @@
+"""
+Tests for the cost query planner
+"""
+from datetime import datetime
+import pytest
+from app.services.query_planner import QueryPlannerService
+
+
+class FakeCostDataService:
+    """Return canned rows for every query and record what was asked"""
+    
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.calls = []
+    
+    def get_cost_data_range(self, subscription_id, start_date, end_date, dimensions=None):
+        self.calls.append((subscription_id, start_date, end_date, list(dimensions)))
+        return {'columns': self.columns, 'rows': self.rows}
+
+
+RESOURCE_COLUMNS = [
+    {'name': 'Cost', 'type': 'Number'},
+    {'name': 'UsageDate', 'type': 'Number'},
+    {'name': 'ResourceType', 'type': 'String'},
+    {'name': 'ResourceGroup', 'type': 'String'},
+    {'name': 'Currency', 'type': 'String'}
+]
+
+
+def test_add_merges_ranges_and_dimensions_into_one_plan():
+    planner = QueryPlannerService(FakeCostDataService([], RESOURCE_COLUMNS))
+    
+    planner.add('sub', datetime(2024, 10, 1), datetime(2024, 10, 8))
+    planner.add('sub', datetime(2024, 10, 5), datetime(2024, 10, 12), ['ResourceGroup'])
+    
+    assert planner.get_plan() == {
+        'sub': [{
+            'dimensions': ['ResourceType', 'ResourceGroup'],
+            'start_date': '2024-10-01',
+            'end_date': '2024-10-12'
+        }]
+    }
+
+
+def test_add_splits_plans_past_the_grouping_limit():
+    planner = QueryPlannerService(FakeCostDataService([], RESOURCE_COLUMNS))
+    
+    planner.add('sub', datetime(2024, 10, 1), datetime(2024, 10, 8), ['ResourceType', 'ResourceGroup'])
+    planner.add('sub', datetime(2024, 10, 1), datetime(2024, 10, 8), ['MeterCategory'])
+    planner.add('sub', datetime(2024, 10, 1), datetime(2024, 10, 8), ['tag:team'])
+    planner.add('sub', datetime(2024, 10, 1), datetime(2024, 10, 8), ['tag:env'])
+    
+    dimensions = [plan['dimensions'] for plan in planner.get_plan()['sub']]
+    assert dimensions == [
+        ['ResourceType', 'ResourceGroup'],
+        ['MeterCategory', 'tag:team'],
+        ['tag:env']
+    ]
+
+
+def test_add_rejects_queries_the_api_cannot_run():
+    planner = QueryPlannerService(FakeCostDataService([], RESOURCE_COLUMNS))
+    
+    with pytest.raises(ValueError):
+        planner.add('sub', datetime(2024, 10, 1), datetime(2024, 10, 8), ['A', 'B', 'C'])
+    with pytest.raises(ValueError):
+        planner.add('sub', datetime(2024, 10, 1), datetime(2024, 10, 8), ['tag:team', 'tag:env'])
+
+
+def test_reaggregate_sums_away_extra_dimensions_and_days():
+    rows = [
+        [1.0, 20241001, 'vm', 'rg-a', 'USD'],
+        [2.0, 20241001, 'vm', 'rg-b', 'USD'],
+        [4.0, 20241002, 'vm', 'rg-a', 'USD'],
+        [8.0, 20241002, 'disk', 'rg-a', 'USD'],
+        [16.0, 20241003, 'vm', 'rg-a', 'USD']
+    ]
+    fake = FakeCostDataService(rows, RESOURCE_COLUMNS)
+    planner = QueryPlannerService(fake)
+    
+    planner.add('sub', datetime(2024, 10, 1), datetime(2024, 10, 3), ['ResourceType', 'ResourceGroup'])
+    planner.execute()
+    
+    by_type = planner.get_cost_data_range('sub', datetime(2024, 10, 1), datetime(2024, 10, 2))
+    assert [column['name'] for column in by_type['columns']] == ['Cost', 'UsageDate', 'ResourceType', 'Currency']
+    assert sorted(by_type['rows']) == [
+        [3.0, 20241001, 'vm', 'USD'],
+        [4.0, 20241002, 'vm', 'USD'],
+        [8.0, 20241002, 'disk', 'USD']
+    ]
+    
+    by_group = planner.get_cost_data_range('sub', datetime(2024, 10, 2), datetime(2024, 10, 3), ['ResourceGroup'])
+    assert sorted(by_group['rows']) == [
+        [12.0, 20241002, 'rg-a', 'USD'],
+        [16.0, 20241003, 'rg-a', 'USD']
+    ]
+    
+    # Both slices are served from the single merged query
+    assert len(fake.calls) == 1
+
+
+def test_reaggregate_picks_the_requested_tag():
+    columns = [
+        {'name': 'Cost', 'type': 'Number'},
+        {'name': 'UsageDate', 'type': 'Number'},
+        {'name': 'ResourceType', 'type': 'String'},
+        {'name': 'TagKey', 'type': 'String'},
+        {'name': 'TagValue', 'type': 'String'},
+        {'name': 'Currency', 'type': 'String'}
+    ]
+    rows = [
+        [1.0, 20241001, 'vm', 'team', 'data', 'USD'],
+        [2.0, 20241001, 'vm', 'Team', 'web', 'USD'],
+        [4.0, 20241001, 'vm', 'env', 'prod', 'USD']
+    ]
+    planner = QueryPlannerService(FakeCostDataService(rows, columns))
+    
+    planner.add('sub', datetime(2024, 10, 1), datetime(2024, 10, 1), ['ResourceType', 'tag:team'])
+    by_team = planner.get_cost_data_range('sub', datetime(2024, 10, 1), datetime(2024, 10, 1), ['tag:team'])
+    
+    # Rows tagged with another key have no value for the requested tag
+    assert sorted(by_team['rows'], key=lambda row: row[0]) == [
+        [1.0, 20241001, 'data', 'USD'],
+        [2.0, 20241001, 'web', 'USD'],
+        [4.0, 20241001, '', 'USD']
+    ]
@@ -138,6 +138,16 @@ function createSubscriptionCard(name, data) {
         `;
     });
     
+    let driverNotes = '';
+    data.anomalies.forEach(anomaly => {
+        if (anomaly.drivers && anomaly.drivers.length > 0) {
+            const drivers = anomaly.drivers
+                .map(driver => `${driver.resource_type} (+$${driver.delta.toFixed(2)})`)
+                .join(', ');
+            driverNotes += `<div style="color: var(--text-secondary); margin-top: 0.5rem;"><strong>${anomaly.category}</strong> driven by: ${drivers}</div>`;
+        }
+    });
+    
     return `
         <div class="card subscription-card ${hasAnomalies ? 'has-anomaly' : ''}">
             <div class="subscription-header">
@@ -161,6 +171,7 @@ function createSubscriptionCard(name, data) {
                     ${tableRows}
                 </tbody>
             </table>
+            ${driverNotes}
         </div>
     `;
 }